@@ -0,0 +1,59 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional
+
+
+class Clock(ABC):
+    """Источник времени для цикла опроса и планировщика."""
+
+    @abstractmethod
+    def time(self) -> float:
+        """Возвращает текущее время в секундах от эпохи."""
+
+    @abstractmethod
+    def sleep(self, seconds: float) -> None:
+        """Ждёт указанное число секунд."""
+
+
+class SystemClock(Clock):
+    """Настоящее время."""
+
+    def time(self) -> float:
+        """Возвращает системное время."""
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        """Усыпляет поток на seconds секунд."""
+        time.sleep(seconds)
+
+
+class SimulatedClock(Clock):
+    """Модельное время: sleep() мгновенно сдвигает часы вперёд.
+
+    Перед сдвигом вызываются обработчики on_sleep — например,
+    Pipeline.join, чтобы фоновые стадии успели доработать
+    «во время» ожидания, как это происходит в реальном времени.
+    """
+
+    def __init__(self, start: float = 0,
+                 on_sleep: Optional[List[Callable[[], None]]] = None) -> None:
+        self._lock = threading.Lock()
+        self._now = start
+        self.on_sleep = list(on_sleep or [])
+
+    def time(self) -> float:
+        """Возвращает модельное время."""
+        with self._lock:
+            return self._now
+
+    def sleep(self, seconds: float) -> None:
+        """Сдвигает модельное время на seconds."""
+        for callback in self.on_sleep:
+            callback()
+        self.advance(seconds)
+
+    def advance(self, seconds: float) -> None:
+        """Сдвигает модельное время без вызова обработчиков."""
+        with self._lock:
+            self._now += seconds
@@ -1,68 +1,198 @@
+import argparse
 import json
 import logging
 import os
+import re
 import requests
+import signal
 import sys
 import telegram
-import time
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import partial
 from http import HTTPStatus
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from dotenv import load_dotenv
+from telegram.ext import CommandHandler, Updater
+from telegram.utils.request import Request
 
 import exceptions
+import metrics
+import notifiers
+import tracing
+from clock import Clock, SystemClock
+from pipeline import Pipeline, Stage
+from scheduler import PriorityScheduler
+from stall_watchdog import Heartbeat, Watchdog
+from storage import StateStore, format_stats, parse_date
+from tenants import Config, ConfigWatcher, Tenant, load_config, load_tenants
 
 load_dotenv()
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+# Один чат или несколько через запятую: студент, наставник, канал группы
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 TOKEN_NAMES = ('PRACTICUM_TOKEN',
                'TELEGRAM_TOKEN',
                'TELEGRAM_CHAT_ID')
 
+# Аккаунт из переменных окружения; вместо него можно описать аккаунты
+# и настройки в TENANTS_FILE — файл перечитывается при изменении и по SIGHUP
+TENANT = 'default'
+# Чат задаётся числовым id или @username канала
+CHAT_ID_PATTERN = re.compile(r'^(-?\d+|@\w+)$')
+TENANTS_FILE = os.getenv('TENANTS_FILE')
+STATE_DB = os.getenv('STATE_DB', 'homework_bot.sqlite3')
+STATS_DAYS = 90
+# Сколько чатов получают сообщение одновременно
+DELIVERY_WORKERS = 4
+
+# Таймауты внешних вызовов, в секундах: без них зависший
+# сокет навсегда останавливает стадию
+API_TIMEOUT = 30
+TELEGRAM_TIMEOUT = 10
+
+# Куда доставлять изменения статусов: бэкенды через запятую
+# и их ограничения по числу одновременных отправок и размеру пачки
+NOTIFIERS = os.getenv('NOTIFIERS', 'telegram').split(',')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+NOTIFY_FILE = os.getenv('NOTIFY_FILE', 'notifications.jsonl')
+NOTIFIER_LIMITS = {
+    'telegram': {'concurrency': DELIVERY_WORKERS, 'batch_size': 10,
+                 'timeout': TELEGRAM_TIMEOUT},
+    'webhook': {'concurrency': 2, 'batch_size': 20},
+    'file': {'concurrency': 1, 'batch_size': 100},
+}
+# Соединения бота с Telegram: параллельные отправки плюс Updater
+# команд, которому нужно workers + 4 = 8 соединений
+TELEGRAM_POOL_SIZE = NOTIFIER_LIMITS['telegram']['concurrency'] + 8
+
+# Задержка от смены статуса ревьюером до доставки в Telegram:
+# границы корзин гистограмм и допустимое значение (SLO), в секундах
+LAG_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 900, 1200, 1800, 3600, 7200)
+LAG_SLO = int(os.getenv('LAG_SLO', str(15 * 60)))
+
 PERIOD_MONTH = 60 * 60 * 24 * 30
+# Источник времени; в тестах и бенчмарках подменяется SimulatedClock
+CLOCK: Clock = SystemClock()
 RETRY_TIME = 60 * 10  # in seconds, default 600
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}',
            'Accept': 'application/json'
            }
 
+# Сколько запросов к API планировщик тратит за RETRY_TIME
+# (0 — по запросу на каждый аккаунт) и как долго аккаунт
+# может оставаться неопрошенным
+REQUEST_BUDGET = int(os.getenv('REQUEST_BUDGET', '0'))
+MAX_STALENESS = int(os.getenv('MAX_STALENESS', str(RETRY_TIME)))
+
+# Трассировка циклов опроса: доля циклов в выборке и файл для OTLP JSON
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0.1'))
+TRACE_FILE = os.getenv('TRACE_FILE', 'traces.jsonl')
+TRACER = tracing.Tracer(TRACE_SAMPLE_RATE)
+
+# Сколько аккаунтов загружать одновременно при backfill
+BACKFILL_WORKERS = 4
+
+# Размер очереди перед каждой стадией и число потоков на стадию.
+# Стадия diff хранит последние статусы, поэтому работает в один поток
+# и сторож не подменяет её зависший поток новым, а перезапускает процесс.
+QUEUE_SIZE = 10
+STAGE_WORKERS = {'fetch': 1,
+                 'validate': 1,
+                 'diff': 1,
+                 'render': 1,
+                 'deliver': 1}
+
+# Сторож: как часто проверять heartbeat'ы и сколько может длиться
+# одна единица работы стадии, прежде чем она считается зависшей
+WATCHDOG_INTERVAL = 30
+WATCHDOG_DEADLINE = 5 * 60
+# Сколько раз сторож подменяет зависший поток стадии до перезапуска процесса
+STAGE_RESTARTS = 3
+
 HOMEWORK_STATUSES = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+# Настройки до применения файла: ключ, удалённый из файла,
+# возвращает значение отсюда, а не последнее применённое
+DEFAULT_SETTINGS = {'retry_time': RETRY_TIME,
+                    'max_staleness': MAX_STALENESS,
+                    'request_budget': REQUEST_BUDGET,
+                    'homework_statuses': dict(HOMEWORK_STATUSES)}
 
 handler = logging.StreamHandler(stream=sys.stdout)
 logger = logging.getLogger(__name__)
 logger.addHandler(handler)
 
 
-def send_message(bot: telegram.Bot, message: str) -> None:
-    """Отправляет сообщение в Telegram чат."""
+def get_chat_ids() -> List[str]:
+    """Возвращает список чатов из TELEGRAM_CHAT_ID."""
+    return [chat_id.strip() for chat_id in str(TELEGRAM_CHAT_ID).split(',')
+            if chat_id.strip()]
+
+
+def send_to_chats(bot: telegram.Bot, chat_ids: List[str],
+                  message: str) -> None:
+    """Параллельно отправляет одно сообщение в несколько Telegram чатов.
+
+    Ошибка в одном чате не мешает доставке в остальные.
+    """
+    notifier = notifiers.TelegramNotifier(bot, concurrency=DELIVERY_WORKERS,
+                                          timeout=TELEGRAM_TIMEOUT)
     try:
-        bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
-        logger.info(
-            msg=f'Отправлено сообщение {message} в чат {TELEGRAM_CHAT_ID}.')
-    except telegram.TelegramError as error:
-        logger.exception(error)
-        logger.debug(f'Ошибка при отправке сообщения {message}')
+        notifier.deliver([notifiers.Notice(tenant=TENANT,
+                                           chat_ids=tuple(chat_ids),
+                                           text=message)])
+    finally:
+        notifier.close()
+
+
+def send_message(bot: telegram.Bot, message: str) -> None:
+    """Отправляет сообщение во все Telegram чаты."""
+    send_to_chats(bot, get_chat_ids(), message)
+
+
+def make_headers(token: str) -> dict:
+    """Возвращает заголовки запроса к API для токена Практикума."""
+    return {'Authorization': f'OAuth {token}',
+            'Accept': 'application/json'}
 
 
 def get_api_answer(current_timestamp: int) -> dict:
     """Делает запрос к единственному эндпоинту API-сервиса."""
-    timestamp = current_timestamp or int(time.time())
+    timestamp = current_timestamp or int(CLOCK.time())
+    return request_homeworks(timestamp, HEADERS)
+
+
+def request_homeworks(timestamp: int, headers: dict) -> dict:
+    """Запрашивает статусы работ с заданными заголовками."""
     params = {'from_date': timestamp}
     # ----- противотестовый костыль -----
     try:
-        response = requests.get(ENDPOINT,
-                                headers=HEADERS,
-                                params=params)
+        with tracing.span('http_fetch', tracing.KIND_CLIENT,
+                          **{'http.url': ENDPOINT}) as span:
+            response = requests.get(ENDPOINT,
+                                    headers=headers,
+                                    params=params,
+                                    timeout=API_TIMEOUT)
+            span.set(**{'http.status_code': int(response.status_code)})
+            # requests не даёт времени DNS и соединения отдельно,
+            # elapsed — время до получения заголовков ответа
+            elapsed = getattr(response, 'elapsed', None)
+            if elapsed is not None:
+                span.set(**{'http.ttfb_ms': elapsed.total_seconds() * 1000})
     except requests.RequestException:
         logger.exception(msg='Запрос к API не удался.')
         raise
     try:
-        response_json = response.json()
+        with tracing.span('json_decode'):
+            response_json = response.json()
         error_keys = {'error', 'message'}
         for key in error_keys:
             if key in list(response_json):
@@ -77,7 +207,7 @@ def get_api_answer(current_timestamp: int) -> dict:
             f'Сбой при запросе к API: {response.status_code}')
         raise exceptions.ServiceDenial(
             f'Сбой при запросе к API: {response.status_code}')
-    return response.json()
+    return response_json
 
 
 def check_response(response: dict) -> list:
@@ -126,53 +256,542 @@ def check_tokens() -> bool:
     return True
 
 
+def get_tenants() -> List[Tenant]:
+    """Возвращает аккаунты из TENANTS_FILE или из переменных окружения."""
+    if TENANTS_FILE:
+        return load_tenants(TENANTS_FILE)
+    return [Tenant(name=TENANT,
+                   practicum_token=PRACTICUM_TOKEN,
+                   chat_ids=tuple(get_chat_ids()))]
+
+
+@dataclass
+class Cycle:
+    """Один цикл опроса API, проходящий через стадии конвейера."""
+
+    tenant: str = TENANT
+    token: Optional[str] = None
+    chat_ids: Tuple[str, ...] = ()
+    timestamp: int = 0
+    response: Optional[dict] = None
+    homeworks: List[dict] = field(default_factory=list)
+    # Моменты по CLOCK для измерения задержки уведомлений
+    fetch_started: float = 0
+    fetch_finished: float = 0
+    trace: Union[tracing.Trace, tracing.NoopTrace] = tracing.NOOP_TRACE
+
+
+@dataclass
+class Notification:
+    """Изменение статуса работы, которое нужно отправить."""
+
+    cycle: Cycle
+    homework: dict
+    message: str = ''
+    enqueued_at: float = 0
+
+
+def fetch_stage(cycle: Cycle, store: StateStore) -> List[Cycle]:
+    """Стадия fetch: запрашивает API начиная с сохранённого курсора."""
+    with tracing.activate(cycle.trace):
+        with tracing.span('check_tokens'):
+            if not (cycle.token or check_tokens()):
+                raise ValueError('Не найден токен API!')
+        cycle.timestamp = (store.get_cursor(cycle.tenant)
+                           or int(CLOCK.time()) - PERIOD_MONTH)
+        cycle.fetch_started = CLOCK.time()
+        with tracing.span('get_api_answer', from_date=cycle.timestamp):
+            if cycle.token:
+                cycle.response = request_homeworks(
+                    cycle.timestamp, make_headers(cycle.token))
+            else:
+                cycle.response = get_api_answer(cycle.timestamp)
+        cycle.fetch_finished = CLOCK.time()
+    return [cycle]
+
+
+def validate_stage(cycle: Cycle) -> List[Cycle]:
+    """Стадия validate: проверяет ответ API."""
+    with tracing.activate(cycle.trace), tracing.span('check_response'):
+        cycle.homeworks = check_response(cycle.response)
+    return [cycle]
+
+
+def diff_stage(cycle: Cycle, store: StateStore,
+               scheduler: Optional[PriorityScheduler] = None
+               ) -> List[Notification]:
+    """Стадия diff: записывает переходы и оставляет изменившиеся работы."""
+    changes = []
+    with tracing.activate(cycle.trace), tracing.span('diff') as span:
+        for homework in cycle.homeworks:
+            if store.record(cycle.tenant, homework, now=CLOCK.time()):
+                changes.append(Notification(cycle=cycle, homework=homework))
+        # Следующий запрос вернёт только то, что изменилось после ответа
+        current_date = cycle.response.get('current_date')
+        if isinstance(current_date, int):
+            store.set_cursor(cycle.tenant, current_date)
+        span.set(changes=len(changes))
+    if scheduler is not None:
+        scheduler.observe(cycle.tenant, cycle.homeworks, bool(changes))
+    if not changes:
+        logger.debug('В ответе нет новых статусов')
+    # Трасса цикла закроется, когда будут отправлены все сообщения
+    cycle.trace.add_pending(len(changes))
+    cycle.trace.done()
+    return changes
+
+
+def render_stage(notification: Notification) -> List[Notification]:
+    """Стадия render: формирует текст сообщения."""
+    trace = notification.cycle.trace
+    with tracing.activate(trace), tracing.span('parse_status'):
+        notification.message = parse_status(notification.homework)
+    return [notification]
+
+
+def deliver_stage(notification: Notification,
+                  dispatcher: notifiers.Dispatcher) -> List[notifiers.Notice]:
+    """Стадия deliver: готовит сообщение для всех бэкендов.
+
+    Конвейер передаёт его в Dispatcher и ждёт места в очередях
+    бэкендов, поэтому сообщение не теряется, а медленная доставка
+    притормаживает опрос.
+    """
+    trace = notification.cycle.trace
+    # Каждый бэкенд закрывает свою ветвь трассы по завершении доставки
+    trace.add_pending(len(dispatcher.notifiers) - 1)
+    notification.enqueued_at = CLOCK.time()
+    return [notifiers.Notice(tenant=notification.cycle.tenant,
+                             chat_ids=tuple(chat_ids_for(notification)),
+                             text=notification.message,
+                             homework=notification.homework,
+                             on_done=partial(delivered, notification))]
+
+
+def delivered(notification: Notification, backend: str,
+              error: Optional[BaseException], started: int,
+              finished: int) -> None:
+    """Отмечает доставку сообщения одним бэкендом.
+
+    Задержка считается по чату владельца — первому чату аккаунта,
+    даже если в другие чаты сообщение не дошло.
+    """
+    owner = chat_ids_for(notification)[0]
+    if backend == 'telegram' and (error is None or (
+            isinstance(error, notifiers.PartialDeliveryError)
+            and owner in error.delivered)):
+        record_lag(notification, CLOCK.time())
+    trace = notification.cycle.trace
+    trace.add_span('send_message', started, finished, error,
+                   backend=backend)
+    trace.done(error)
+
+
+def record_lag(notification: Notification, acked_at: float) -> None:
+    """Учитывает задержку от date_updated до подтверждения Telegram.
+
+    Задержка раскладывается на ожидание опроса, запрос к API,
+    обработку в конвейере и ожидание в очереди доставки.
+    """
+    changed_at = parse_date(notification.homework.get('date_updated'))
+    if changed_at is None:
+        return
+    cycle = notification.cycle
+    # date_updated приходит с точностью до секунды, не уходим в минус
+    parts = {
+        'poll_wait': max(cycle.fetch_started - changed_at, 0),
+        'fetch': cycle.fetch_finished - cycle.fetch_started,
+        'processing': notification.enqueued_at - cycle.fetch_finished,
+        'delivery_queue': acked_at - notification.enqueued_at,
+    }
+    lag = max(acked_at - changed_at, 0)
+    metrics.REGISTRY.histogram('notification_lag_seconds',
+                               LAG_BUCKETS).observe(lag)
+    for part, seconds in parts.items():
+        metrics.REGISTRY.histogram(f'notification_lag_{part}_seconds',
+                                   LAG_BUCKETS).observe(seconds)
+    if lag > LAG_SLO:
+        metrics.REGISTRY.counter('notification_lag_slo_breaches').inc()
+        logger.warning(
+            f'Сообщение о работе {notification.homework.get("homework_name")}'
+            f' доставлено через {lag:.0f} с, SLO {LAG_SLO} с: {parts}')
+
+
+def chat_ids_for(item: object) -> List[str]:
+    """Возвращает чаты аккаунта, к которому относится элемент конвейера."""
+    cycle = item.cycle if isinstance(item, Notification) else item
+    if isinstance(cycle, Cycle) and cycle.chat_ids:
+        return list(cycle.chat_ids)
+    return get_chat_ids()
+
+
+def trace_for(item: object) -> Union[tracing.Trace, tracing.NoopTrace]:
+    """Возвращает трассу цикла, к которому относится элемент конвейера."""
+    cycle = item.cycle if isinstance(item, Notification) else item
+    if isinstance(cycle, Cycle):
+        return cycle.trace
+    return tracing.NOOP_TRACE
+
+
+class ErrorReporter:
+    """Сообщает об ошибках стадий в Telegram, не повторяя одну и ту же."""
+
+    def __init__(self, bot: telegram.Bot) -> None:
+        """Запоминает бота для отправки ошибок."""
+        self.bot = bot
+        self.old_errors: Dict[str, str] = {}
+
+    def __call__(self, stage: str, item: object,
+                 error: BaseException) -> None:
+        """Отправляет сообщение об ошибке, если она новая."""
+        trace_for(item).done(error)
+        # Ошибки бота нужны только владельцу — первому чату аккаунта
+        chat_id = chat_ids_for(item)[0]
+        if str(error) != self.old_errors.get(chat_id):
+            send_to_chats(self.bot, [chat_id], str(error))
+            self.old_errors[chat_id] = str(error)
+        logging.error(f'{error}')
+
+
+def build_notifiers(bot: telegram.Bot) -> List[notifiers.Notifier]:
+    """Создаёт бэкенды уведомлений из настройки NOTIFIERS."""
+    options = {'telegram': {'bot': bot},
+               'webhook': {'url': WEBHOOK_URL},
+               'file': {'path': NOTIFY_FILE}}
+    names = [name.strip() for name in NOTIFIERS if name.strip()]
+    unknown = [name for name in names if name not in notifiers.BACKENDS]
+    if unknown:
+        raise ValueError(f'Неизвестные бэкенды уведомлений: {unknown}')
+    if 'webhook' in names and not WEBHOOK_URL:
+        raise ValueError('Для бэкенда webhook не задан WEBHOOK_URL')
+    return [notifiers.BACKENDS[name](**options[name], **NOTIFIER_LIMITS[name])
+            for name in names]
+
+
+def build_pipeline(bot: telegram.Bot,
+                   store: Optional[StateStore] = None,
+                   scheduler: Optional[PriorityScheduler] = None,
+                   backends: Optional[List[notifiers.Notifier]] = None
+                   ) -> Pipeline:
+    """Собирает конвейер fetch → validate → diff → render → deliver."""
+    store = store or StateStore()
+    dispatcher = notifiers.Dispatcher(
+        backends or [notifiers.TelegramNotifier(bot)],
+        deadline=WATCHDOG_DEADLINE)
+    handlers = {'fetch': partial(fetch_stage, store=store),
+                'validate': validate_stage,
+                'diff': partial(diff_stage, store=store,
+                                scheduler=scheduler),
+                'render': render_stage,
+                'deliver': partial(deliver_stage, dispatcher=dispatcher)}
+    stages = [Stage(name, handler,
+                    workers=STAGE_WORKERS[name],
+                    maxsize=QUEUE_SIZE,
+                    deadline=WATCHDOG_DEADLINE,
+                    max_restarts=0 if name == 'diff' else STAGE_RESTARTS)
+              for name, handler in handlers.items()]
+    return Pipeline(stages, on_error=ErrorReporter(bot), sink=dispatcher)
+
+
+def chat_keys(chat: telegram.Chat) -> List[str]:
+    """Возвращает варианты записи чата в настройках: id и @username."""
+    keys = [str(chat.id)]
+    if chat.username:
+        keys.append(f'@{chat.username}')
+    return keys
+
+
+def stats_command(update: telegram.Update, context, store: StateStore,
+                  chat_tenants: Dict[str, str]) -> None:
+    """Отвечает на команду /stats [from_status to_status [days]].
+
+    CommandHandler срабатывает и на исправленное сообщение,
+    тогда update.message пуст — отвечаем через effective_message.
+    """
+    # Каждый чат видит статистику только своего аккаунта
+    tenant = next((chat_tenants[key] for key in chat_keys(
+        update.effective_chat) if key in chat_tenants), None)
+    if tenant is None:
+        return
+    args = context.args or []
+    from_status = args[0] if args else 'reviewing'
+    to_status = args[1] if len(args) > 1 else 'approved'
+    try:
+        days = int(args[2]) if len(args) > 2 else STATS_DAYS
+    except ValueError:
+        update.effective_message.reply_text('Период должен быть числом дней.')
+        return
+    rows = store.stats(from_status, to_status, days, tenant=tenant)
+    update.effective_message.reply_text(
+        format_stats(rows, from_status, to_status, days))
+
+
+def start_commands(bot: telegram.Bot, store: StateStore,
+                   chat_tenants: Dict[str, str]) -> Updater:
+    """Запускает обработку команд бота в фоновом потоке."""
+    updater = Updater(bot=bot)
+    updater.dispatcher.add_handler(CommandHandler(
+        'stats', partial(stats_command, store=store,
+                         chat_tenants=chat_tenants)))
+    updater.start_polling()
+    return updater
+
+
+def build_scheduler(tenants: List[Tenant],
+                    clock: Optional[Clock] = None) -> PriorityScheduler:
+    """Создаёт планировщик опроса аккаунтов."""
+    scheduler = PriorityScheduler(clock or CLOCK,
+                                  budget=REQUEST_BUDGET or len(tenants),
+                                  max_staleness=MAX_STALENESS,
+                                  tick=RETRY_TIME)
+    scheduler.set_tenants(tenant.name for tenant in tenants)
+    return scheduler
+
+
+def apply_config(config: Config, scheduler: PriorityScheduler,
+                 tenants: Dict[str, Tenant],
+                 chat_tenants: Dict[str, str]) -> None:
+    """Применяет настройки к работающему боту.
+
+    Вызывается между тиками опроса, поэтому планировщик видит
+    либо старые, либо новые настройки целиком. Циклы, уже
+    попавшие в конвейер, несут свой токен и чаты и доработают
+    со старыми значениями.
+    """
+    global RETRY_TIME, MAX_STALENESS, REQUEST_BUDGET, HOMEWORK_STATUSES
+    # Сначала всё проверяем и собираем, потом меняем: ошибка
+    # в настройках не должна оставить бота применённым наполовину
+    new = {tenant.name: tenant for tenant in config.tenants}
+    chats = {}
+    for tenant in new.values():
+        for chat_id in tenant.chat_ids:
+            if not CHAT_ID_PATTERN.match(chat_id):
+                raise ValueError(f'Неверный чат {chat_id!r} '
+                                 f'у аккаунта {tenant.name}')
+            chats[chat_id] = tenant.name
+    retry_time = config.retry_time or DEFAULT_SETTINGS['retry_time']
+    max_staleness = (config.max_staleness
+                     or DEFAULT_SETTINGS['max_staleness'])
+    request_budget = (DEFAULT_SETTINGS['request_budget']
+                      if config.request_budget is None
+                      else config.request_budget)
+    # Новый словарь подменяется целиком: parse_status в других
+    # потоках видит либо старые, либо новые шаблоны
+    statuses = {**DEFAULT_SETTINGS['homework_statuses'],
+                **(config.homework_statuses or {})}
+    added = sorted(new.keys() - tenants.keys())
+    removed = sorted(tenants.keys() - new.keys())
+    changed = sorted(name for name in new.keys() & tenants.keys()
+                     if new[name] != tenants[name])
+
+    RETRY_TIME, MAX_STALENESS = retry_time, max_staleness
+    REQUEST_BUDGET, HOMEWORK_STATUSES = request_budget, statuses
+    tenants.update(new)
+    for name in removed:
+        del tenants[name]
+    scheduler.set_tenants(new)
+    scheduler.tick = RETRY_TIME
+    scheduler.max_staleness = MAX_STALENESS
+    scheduler.budget = REQUEST_BUDGET or len(new)
+    chat_tenants.update(chats)
+    for chat_id in chat_tenants.keys() - chats.keys():
+        del chat_tenants[chat_id]
+    logger.info(f'Настройки применены: добавлены {added}, удалены {removed}, '
+                f'изменены {changed}, RETRY_TIME={RETRY_TIME}')
+
+
+def reload_config(watcher: ConfigWatcher, scheduler: PriorityScheduler,
+                  tenants: Dict[str, Tenant],
+                  chat_tenants: Dict[str, str]) -> None:
+    """Перечитывает файл настроек, если он изменился."""
+    try:
+        config = watcher.poll()
+        if config is not None:
+            apply_config(config, scheduler, tenants, chat_tenants)
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        logger.error(f'Не удалось применить {watcher.path}, '
+                     f'работаем со старыми настройками: {error}')
+
+
+def run_polling(pipeline: Pipeline, scheduler: PriorityScheduler,
+                tenants: Dict[str, Tenant], clock: Optional[Clock] = None,
+                cycles: Optional[int] = None,
+                on_tick: Optional[Callable[[], None]] = None,
+                heartbeat: Optional[Heartbeat] = None) -> None:
+    """Раз в RETRY_TIME опрашивает аккаунты, выбранные планировщиком.
+
+    tenants может меняться между тиками через on_tick.
+    Если cycles не задан, опрашивает бесконечно.
+    heartbeat отмечает для сторожа перечитывание настроек и выбор
+    аккаунтов; сон и ожидание места в очереди fetch не в счёт.
+    """
+    clock = clock or CLOCK
+    done = 0
+    while cycles is None or done < cycles:
+        if heartbeat is not None:
+            heartbeat.busy()
+        if on_tick is not None:
+            on_tick()
+        due = scheduler.due()
+        if heartbeat is not None:
+            heartbeat.idle()
+        for name in due:
+            tenant = tenants[name]
+            # Если стадии не успевают, очередь fetch заполнится
+            # и опрос подождёт, пока они разгрузятся
+            pipeline.submit(Cycle(tenant=tenant.name,
+                                  token=tenant.practicum_token,
+                                  chat_ids=tenant.chat_ids,
+                                  trace=TRACER.start('poll_cycle',
+                                                     tenant=tenant.name)))
+        logger.debug(metrics.REGISTRY.render())
+        logger.debug(f'Распределение запросов: {scheduler.report()}')
+        clock.sleep(RETRY_TIME)
+        done += 1
+
+
 def main():
     """Основная логика работы бота."""
     logging.basicConfig(
         format='%(asctime)s [%(levelname)s] %(message)s',
         filename='hw_log.log',
         level=logging.DEBUG)
-    current_timestamp = int(time.time())
-    old_status = ''
-    old_error = ''
-
-    while True:
-        try:
-            # Назначаем бота
-            bot = telegram.Bot(token=TELEGRAM_TOKEN)
-            # Выбираем временной период
-            current_timestamp = current_timestamp - PERIOD_MONTH
-            # Проверяем токены. Ошибка в них вызывает лавину ошибок,
-            # поэтому их проверяем отдельно и прерываем выполнение программы
-            if not check_tokens():
-                logger.debug('Ошибка токенов, всё пропало!')
-                return
-            # Сделать запрос к API.
-            response = get_api_answer(current_timestamp)
-            # Проверить ответ.
-            homeworks = check_response(response)
-            # Если есть обновления — получить статус работы из
-            # обновления и отправить сообщение в Telegram.
+    # Проверяем токены. Ошибка в них вызывает лавину ошибок,
+    # поэтому их проверяем отдельно и прерываем выполнение программы
+    if not check_tokens():
+        logger.debug('Ошибка токенов, всё пропало!')
+        return
+    bot = telegram.Bot(token=TELEGRAM_TOKEN, request=Request(
+        con_pool_size=TELEGRAM_POOL_SIZE))
+    try:
+        backends = build_notifiers(bot)
+    except ValueError as error:
+        logger.critical(f'Ошибка настройки NOTIFIERS: {error}')
+        return
+    TRACER.export_to(TRACE_FILE)
+    store = StateStore(STATE_DB)
+    tenants: Dict[str, Tenant] = {}
+    chat_tenants: Dict[str, str] = {}
+    scheduler = build_scheduler([])
+    try:
+        apply_config(load_config(TENANTS_FILE) if TENANTS_FILE
+                     else Config(tenants=tuple(get_tenants())),
+                     scheduler, tenants, chat_tenants)
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        logger.critical(f'Ошибка в настройках аккаунтов: {error}')
+        return
+    for name in tenants:
+        scheduler.observe(name, store.current_statuses(name), changed=False)
+    pipeline = build_pipeline(bot, store, scheduler, backends)
+    pipeline.start()
+    start_commands(bot, store, chat_tenants)
+    on_tick = None
+    if TENANTS_FILE:
+        watcher = ConfigWatcher(TENANTS_FILE)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, watcher.request)
+        on_tick = partial(reload_config, watcher, scheduler, tenants,
+                          chat_tenants)
+    # Цикл опроса идёт в главном потоке: зависнув, он перезапускает процесс
+    poll_heartbeat = Heartbeat('poll_loop', WATCHDOG_DEADLINE)
+    watchdog = Watchdog(WATCHDOG_INTERVAL)
+    watchdog.watch(pipeline.heartbeats)
+    watchdog.watch(lambda: [poll_heartbeat])
+    watchdog.start()
+    run_polling(pipeline, scheduler, tenants, on_tick=on_tick,
+                heartbeat=poll_heartbeat)
+
+
+def backfill_tenant(tenant: Tenant, store: StateStore) -> int:
+    """Загружает всю историю аккаунта одним запросом с from_date=0.
+
+    API не ограничивает период сверху и на любой from_date отдаёт
+    всё, что обновлялось позже, поэтому деление на окна только
+    повторяло бы ту же историю. Результат записывается одной
+    транзакцией вместе с курсором, поэтому после загрузки обычный
+    опрос не присылает старые статусы.
+    """
+    now = int(CLOCK.time())
+    response = request_homeworks(0, make_headers(tenant.practicum_token))
+    homeworks = check_response(response)
+    ordered = sorted(homeworks,
+                     key=lambda homework: homework.get('date_updated', ''))
+    return store.record_many(tenant.name, ordered,
+                             cursor=response.get('current_date') or now,
+                             now=now)
+
+
+def backfill(args: argparse.Namespace) -> int:
+    """Загружает историю работ в локальное хранилище.
+
+    Аккаунты загружаются параллельно, не больше args.workers сразу;
+    ошибка одного аккаунта не мешает остальным. Возвращает код
+    выхода: 1, если хоть один аккаунт не загружен.
+    """
+    tenants = [tenant for tenant in get_tenants()
+               if not args.tenant or tenant.name == args.tenant]
+    if not tenants:
+        print(f'Аккаунт {args.tenant} не найден', file=sys.stderr)
+        return 1
+    store = StateStore(args.db)
+    failed = []
+    with ThreadPoolExecutor(max_workers=args.workers,
+                            thread_name_prefix='backfill') as pool:
+        futures = {pool.submit(backfill_tenant, tenant, store): tenant
+                   for tenant in tenants}
+        for future in as_completed(futures):
+            tenant = futures[future]
             try:
-                hw_result = parse_status(homeworks[0])
-            except IndexError as error:
-                logger.exception(error)
-                raise
-            if hw_result == old_status:
-                logger.debug('В ответе нет новых статусов')
-            else:
-                send_message(bot=bot, message=hw_result)
-                old_status = hw_result
+                recorded = future.result()
+            except (Exception, exceptions.ServiceDenial) as error:
+                failed.append(tenant.name)
+                print(f'{tenant.name}: ошибка загрузки: {error}',
+                      file=sys.stderr)
+                continue
+            print(f'{tenant.name}: загружено статусов: {recorded}')
+    store.close()
+    if failed:
+        print(f'Не загружены аккаунты: {", ".join(sorted(failed))}',
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+def stats(args: argparse.Namespace) -> None:
+    """Печатает статистику переходов из локальной истории."""
+    store = StateStore(args.db)
+    rows = store.stats(args.from_status, args.to_status, args.days,
+                       tenant=args.tenant)
+    print(format_stats(rows, args.from_status, args.to_status, args.days))
+    store.close()
 
-        except Exception as error:
-            if error != old_error:
-                send_message(bot, error)
-                old_error = error
-            logging.error(f'{error}')
 
-        finally:
-            time.sleep(RETRY_TIME)
+def cli(argv: Optional[List[str]] = None) -> None:
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(description='Бот-помощник Практикума.')
+    commands = parser.add_subparsers(dest='command')
+    stats_parser = commands.add_parser(
+        'stats', help='статистика времени между статусами')
+    stats_parser.add_argument('--from', dest='from_status',
+                              default='reviewing')
+    stats_parser.add_argument('--to', dest='to_status', default='approved')
+    stats_parser.add_argument('--days', type=int, default=STATS_DAYS)
+    stats_parser.add_argument('--tenant')
+    stats_parser.add_argument('--db', default=STATE_DB)
+    backfill_parser = commands.add_parser(
+        'backfill', help='загрузить историю работ с начала времён')
+    backfill_parser.add_argument('--tenant')
+    backfill_parser.add_argument('--workers', type=int,
+                                 default=BACKFILL_WORKERS)
+    backfill_parser.add_argument('--db', default=STATE_DB)
+    args = parser.parse_args(argv)
+    if args.command == 'stats':
+        stats(args)
+    elif args.command == 'backfill':
+        sys.exit(backfill(args))
+    else:
+        main()
 
 
 if __name__ == '__main__':
-    main()
+    cli()
@@ -0,0 +1,118 @@
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Sequence
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Counter:
+    """Монотонно растущий счётчик."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        """Увеличивает счётчик."""
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> float:
+        """Возвращает текущее значение."""
+        return self.value
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self._lock = threading.Lock()
+        self.buckets = tuple(sorted(buckets))
+        # последняя корзина — всё, что больше верхней границы
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Добавляет наблюдение."""
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Оценивает квантиль по верхней границе корзины."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = q * self.count
+            seen = 0
+            for index, amount in enumerate(self.counts):
+                seen += amount
+                if seen >= rank and amount:
+                    break
+        if index < len(self.buckets):
+            return self.buckets[index]
+        return float('inf')
+
+    def snapshot(self) -> dict:
+        """Возвращает сводку по гистограмме."""
+        return {'count': self.count,
+                'sum': round(self.sum, 6),
+                'p50': self.quantile(0.5),
+                'p95': self.quantile(0.95)}
+
+
+class Gauge:
+    """Значение, вычисляемое в момент снятия метрик."""
+
+    def __init__(self, func: Callable[[], float]) -> None:
+        self.func = func
+
+    def snapshot(self) -> float:
+        """Возвращает текущее значение."""
+        return self.func()
+
+
+class Registry:
+    """Реестр именованных метрик."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+
+    def _get(self, name: str, factory: Callable[[], object]):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+    def counter(self, name: str) -> Counter:
+        """Возвращает счётчик по имени, создавая его при необходимости."""
+        return self._get(name, Counter)
+
+    def histogram(self, name: str,
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Возвращает гистограмму по имени."""
+        return self._get(name, lambda: Histogram(buckets))
+
+    def gauge(self, name: str, func: Callable[[], float]) -> Gauge:
+        """Регистрирует вычисляемое значение."""
+        with self._lock:
+            self._metrics[name] = Gauge(func)
+            return self._metrics[name]
+
+    def snapshot(self) -> dict:
+        """Возвращает значения всех метрик."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {name: metric.snapshot()
+                for name, metric in sorted(metrics.items())}
+
+    def render(self) -> str:
+        """Форматирует метрики для записи в лог."""
+        return ' '.join(f'{name}={value}'
+                        for name, value in self.snapshot().items())
+
+
+REGISTRY = Registry()
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+import metrics
+from stall_watchdog import Heartbeat
+
+logger = logging.getLogger(__name__)
+
+# (бэкенд, ошибка или None, начало и конец доставки в наносекундах)
+DoneCallback = Callable[[str, Optional[BaseException], int, int], None]
+
+
+@dataclass
+class Notice:
+    """Сообщение, которое нужно доставить всеми бэкендами."""
+
+    tenant: str
+    chat_ids: Tuple[str, ...]
+    text: str
+    homework: dict = field(default_factory=dict)
+    on_done: Optional[DoneCallback] = None
+
+
+class PartialDeliveryError(Exception):
+    """Сообщение дошло не во все чаты."""
+
+    def __init__(self, delivered: Tuple[str, ...],
+                 failed: Dict[str, BaseException]) -> None:
+        super().__init__(', '.join(f'{chat_id}: {error}'
+                                   for chat_id, error in failed.items()))
+        self.delivered = delivered
+        self.failed = failed
+
+
+BACKENDS: Dict[str, type] = {}
+
+
+def register(name: str) -> Callable[[type], type]:
+    """Регистрирует класс бэкенда под именем из настройки NOTIFIERS."""
+    def decorator(cls: type) -> type:
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+class Notifier(ABC):
+    """Бэкенд уведомлений с асинхронной доставкой пачками.
+
+    Блокирующие вызовы выполняются в собственном пуле потоков
+    размером concurrency, поэтому бэкенд не занимает чужие потоки.
+    """
+
+    name = ''
+
+    def __init__(self, concurrency: int = 1, batch_size: int = 1) -> None:
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix=f'notify-{self.name}')
+
+    async def run_blocking(self, func: Callable, *args, **kwargs):
+        """Выполняет блокирующий вызов в пуле бэкенда."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, partial(func, *args, **kwargs))
+
+    @abstractmethod
+    async def deliver_batch(
+            self, notices: List[Notice]) -> List[Optional[BaseException]]:
+        """Доставляет пачку сообщений, возвращает ошибку для каждого."""
+
+    def deliver(self, notices: List[Notice]) -> List[Optional[BaseException]]:
+        """Доставляет пачку синхронно, без Dispatcher."""
+        return asyncio.run(self.deliver_batch(notices))
+
+    def close(self) -> None:
+        """Освобождает пул потоков."""
+        self._executor.shutdown(wait=True)
+
+
+@register('telegram')
+class TelegramNotifier(Notifier):
+    """Отправка в Telegram; ошибка в одном чате не мешает остальным."""
+
+    def __init__(self, bot, concurrency: int = 4, batch_size: int = 10,
+                 timeout: float = 10) -> None:
+        super().__init__(concurrency, batch_size)
+        self.bot = bot
+        self.timeout = timeout
+
+    async def _send(self, chat_id: str, text: str) -> None:
+        await self.run_blocking(self.bot.send_message, chat_id=chat_id,
+                                text=text, timeout=self.timeout)
+        logger.info(f'Отправлено сообщение {text} в чат {chat_id}.')
+
+    async def deliver_batch(
+            self, notices: List[Notice]) -> List[Optional[BaseException]]:
+        """Отправляет все сообщения пачки во все их чаты параллельно.
+
+        Если сообщение дошло лишь в часть чатов, его ошибка —
+        PartialDeliveryError со списком доставленных.
+        """
+        sends = [(notice, chat_id)
+                 for notice in notices for chat_id in notice.chat_ids]
+        results = await asyncio.gather(
+            *(self._send(chat_id, notice.text) for notice, chat_id in sends),
+            return_exceptions=True)
+        failed: Dict[int, Dict[str, BaseException]] = {}
+        for (notice, chat_id), result in zip(sends, results):
+            if isinstance(result, BaseException):
+                logger.error(f'Сбой отправки в чат {chat_id}: {result}')
+                failed.setdefault(id(notice), {})[chat_id] = result
+        errors: List[Optional[BaseException]] = []
+        for notice in notices:
+            chat_errors = failed.get(id(notice), {})
+            delivered = tuple(chat_id for chat_id in notice.chat_ids
+                              if chat_id not in chat_errors)
+            if not chat_errors:
+                errors.append(None)
+            elif not delivered:
+                errors.append(next(iter(chat_errors.values())))
+            else:
+                errors.append(PartialDeliveryError(delivered, chat_errors))
+        return errors
+
+
+@register('webhook')
+class WebhookNotifier(Notifier):
+    """Отправка пачки сообщений одним HTTP POST с JSON."""
+
+    def __init__(self, url: str, concurrency: int = 2, batch_size: int = 20,
+                 timeout: float = 10) -> None:
+        super().__init__(concurrency, batch_size)
+        self.url = url
+        self.timeout = timeout
+
+    async def deliver_batch(
+            self, notices: List[Notice]) -> List[Optional[BaseException]]:
+        """Отправляет пачку на URL вебхука."""
+        payload = [{'tenant': notice.tenant,
+                    'chat_ids': list(notice.chat_ids),
+                    'text': notice.text,
+                    'homework': notice.homework}
+                   for notice in notices]
+        try:
+            response = await self.run_blocking(
+                requests.post, self.url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as error:
+            logger.error(f'Сбой отправки на вебхук {self.url}: {error}')
+            return [error] * len(notices)
+        return [None] * len(notices)
+
+
+@register('file')
+class FileNotifier(Notifier):
+    """Запись сообщений в файл, по строке JSON на сообщение.
+
+    Годится для нагрузочной проверки конвейера без внешних сервисов.
+    """
+
+    def __init__(self, path: str, concurrency: int = 1,
+                 batch_size: int = 100) -> None:
+        super().__init__(concurrency, batch_size)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _write(self, lines: List[str]) -> None:
+        with self._lock, open(self.path, 'a', encoding='utf-8') as file:
+            file.writelines(lines)
+
+    async def deliver_batch(
+            self, notices: List[Notice]) -> List[Optional[BaseException]]:
+        """Дописывает пачку в файл."""
+        lines = [json.dumps({'tenant': notice.tenant,
+                             'chat_ids': list(notice.chat_ids),
+                             'text': notice.text}, ensure_ascii=False) + '\n'
+                 for notice in notices]
+        try:
+            await self.run_blocking(self._write, lines)
+        except OSError as error:
+            logger.error(f'Сбой записи в {self.path}: {error}')
+            return [error] * len(notices)
+        return [None] * len(notices)
+
+
+class Dispatcher:
+    """Раздаёт сообщения бэкендам в отдельном потоке с циклом asyncio.
+
+    У каждого бэкенда своя очередь и concurrency задач-обработчиков,
+    поэтому медленный бэкенд задерживает только свои сообщения —
+    пока его очередь не заполнится: тогда put() ждёт, и конвейер
+    притормаживает, а не теряет сообщения.
+    Зависшую задачу-обработчик не перезапустить отдельно, поэтому
+    её heartbeat без restart() — сторож перезапустит процесс.
+    """
+
+    def __init__(self, notifiers: List[Notifier], queue_size: int = 1000,
+                 deadline: float = 300) -> None:
+        self.notifiers = notifiers
+        self.queue_size = queue_size
+        self.deadline = deadline
+        self._heartbeats: List[Heartbeat] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Запускает цикл asyncio и обработчики всех бэкендов."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        name='notifiers', daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup(), self._loop).result()
+
+    async def _setup(self) -> None:
+        for notifier in self.notifiers:
+            queue = asyncio.Queue(maxsize=self.queue_size)
+            self._queues[notifier.name] = queue
+            metrics.REGISTRY.gauge(f'notifier_{notifier.name}_queue',
+                                   queue.qsize)
+            for _ in range(notifier.concurrency):
+                heartbeat = Heartbeat(f'notifier_{notifier.name}',
+                                      self.deadline)
+                self._heartbeats.append(heartbeat)
+                self._tasks.append(asyncio.ensure_future(
+                    self._consume(notifier, queue, heartbeat)))
+
+    def heartbeats(self) -> List[Heartbeat]:
+        """Возвращает heartbeat'ы задач-обработчиков."""
+        return list(self._heartbeats)
+
+    async def _consume(self, notifier: Notifier, queue: asyncio.Queue,
+                       heartbeat: Heartbeat) -> None:
+        prefix = f'notifier_{notifier.name}'
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < notifier.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            started = time.time_ns()
+            heartbeat.busy()
+            try:
+                errors = await notifier.deliver_batch(batch)
+            except Exception as error:
+                logger.exception(f'Сбой бэкенда {notifier.name}: {error}')
+                errors = [error] * len(batch)
+            finally:
+                heartbeat.idle()
+            finished = time.time_ns()
+            metrics.REGISTRY.histogram(f'{prefix}_batch_seconds').observe(
+                (finished - started) / 1e9)
+            for notice, error in zip(batch, errors):
+                if isinstance(error, PartialDeliveryError):
+                    outcome = 'partial'
+                else:
+                    outcome = 'failed' if error else 'sent'
+                metrics.REGISTRY.counter(f'{prefix}_{outcome}').inc()
+                self._done(notice, notifier.name, error, started, finished)
+                queue.task_done()
+
+    def _done(self, notice: Notice, name: str,
+              error: Optional[BaseException], started: int,
+              finished: int) -> None:
+        if notice.on_done is None:
+            return
+        try:
+            notice.on_done(name, error, started, finished)
+        except Exception as callback_error:
+            logger.exception(callback_error)
+
+    async def _put(self, notice: Notice) -> None:
+        for notifier in self.notifiers:
+            await self._queues[notifier.name].put(notice)
+
+    def put(self, notice: Notice) -> None:
+        """Ставит сообщение в очереди всех бэкендов, ожидая места.
+
+        Доставки не ждёт; вызывать из потоков конвейера, не из цикла.
+        """
+        asyncio.run_coroutine_threadsafe(self._put(notice),
+                                         self._loop).result()
+
+    def join(self) -> None:
+        """Ждёт, пока бэкенды доставят всё отправленное."""
+        async def drain() -> None:
+            await asyncio.gather(*(queue.join()
+                                   for queue in self._queues.values()))
+        asyncio.run_coroutine_threadsafe(drain(), self._loop).result()
+
+    async def _cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._heartbeats.clear()
+
+    def stop(self) -> None:
+        """Доставляет очереди и останавливает цикл и бэкенды."""
+        self.join()
+        asyncio.run_coroutine_threadsafe(self._cancel(),
+                                         self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        for notifier in self.notifiers:
+            notifier.close()
@@ -0,0 +1,191 @@
+import logging
+import queue
+import threading
+import time
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional
+
+import exceptions
+import metrics
+from stall_watchdog import Heartbeat
+
+logger = logging.getLogger(__name__)
+
+# Сигнал остановки для рабочих потоков стадии
+STOP = object()
+
+Handler = Callable[[object], Optional[Iterable[object]]]
+ErrorHandler = Callable[[str, object, BaseException], None]
+
+
+class Stage:
+    """Стадия конвейера: пул потоков, читающих из ограниченной очереди.
+
+    Обработчик получает элемент и возвращает итерируемое с элементами
+    для следующей стадии (или None). Очередь ограничена, поэтому
+    медленная стадия тормозит предыдущие, а не копит элементы в памяти.
+    """
+
+    def __init__(self, name: str, handler: Handler, workers: int = 1,
+                 maxsize: int = 10, deadline: float = 300,
+                 max_restarts: int = 3) -> None:
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.deadline = deadline
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        self.inbox = queue.Queue(maxsize=maxsize)
+        self.next_stage: Optional[object] = None
+        self.on_error: Optional[ErrorHandler] = None
+        self._lock = threading.Lock()
+        self._spawned = 0
+        self._threads: Dict[threading.Thread, Heartbeat] = {}
+        prefix = f'pipeline_{name}'
+        self.processed = metrics.REGISTRY.counter(f'{prefix}_processed')
+        self.failed = metrics.REGISTRY.counter(f'{prefix}_failed')
+        self.seconds = metrics.REGISTRY.histogram(f'{prefix}_seconds')
+        self.blocked = metrics.REGISTRY.histogram(
+            f'{prefix}_blocked_seconds')
+        metrics.REGISTRY.gauge(f'{prefix}_queue', self.inbox.qsize)
+
+    def put(self, item: object) -> None:
+        """Кладёт элемент во входную очередь, ожидая свободного места."""
+        self.inbox.put(item)
+
+    def _spawn(self) -> None:
+        heartbeat = Heartbeat(f'pipeline_{self.name}', self.deadline)
+        thread = threading.Thread(target=self._run, args=(heartbeat,),
+                                  name=f'{self.name}-{self._spawned}',
+                                  daemon=True)
+        heartbeat.restart = partial(self._replace, thread)
+        self._spawned += 1
+        self._threads[thread] = heartbeat
+        thread.start()
+
+    def _replace(self, thread: threading.Thread) -> bool:
+        """Заменяет зависший рабочий поток новым.
+
+        Зависший поток нельзя прервать: он доработает текущий элемент,
+        если когда-нибудь вернётся, и завершится.
+        """
+        with self._lock:
+            if self.restarts >= self.max_restarts:
+                return False
+            self.restarts += 1
+            self._threads.pop(thread, None)
+            self._spawn()
+            return True
+
+    def heartbeats(self) -> List[Heartbeat]:
+        """Возвращает heartbeat'ы рабочих потоков."""
+        with self._lock:
+            return list(self._threads.values())
+
+    def start(self) -> None:
+        """Запускает рабочие потоки стадии."""
+        with self._lock:
+            for _ in range(self.workers):
+                self._spawn()
+
+    def stop(self) -> None:
+        """Останавливает рабочие потоки после обработки очереди."""
+        with self._lock:
+            threads = list(self._threads)
+            self._threads.clear()
+        for _ in threads:
+            self.inbox.put(STOP)
+        for thread in threads:
+            thread.join()
+
+    def _forward(self, results: Optional[Iterable[object]]) -> None:
+        for result in results or ():
+            if self.next_stage is None:
+                continue
+            started = time.monotonic()
+            self.next_stage.put(result)
+            self.blocked.observe(time.monotonic() - started)
+
+    def _run(self, heartbeat: Heartbeat) -> None:
+        while not heartbeat.retired:
+            item = self.inbox.get()
+            if item is STOP:
+                self.inbox.task_done()
+                return
+            started = time.monotonic()
+            try:
+                # Ожидание места в следующей очереди — не зависание стадии
+                heartbeat.busy()
+                results = self.handler(item)
+                heartbeat.idle()
+                self._forward(results)
+                self.processed.inc()
+            except (Exception, exceptions.ServiceDenial) as error:
+                self.failed.inc()
+                logger.error(f'Ошибка на стадии {self.name}: {error}')
+                if self.on_error is not None:
+                    self.on_error(self.name, item, error)
+            finally:
+                heartbeat.idle()
+                self.seconds.observe(time.monotonic() - started)
+                self.inbox.task_done()
+
+
+class Pipeline:
+    """Цепочка стадий, связанных ограниченными очередями.
+
+    sink — внешний получатель результатов последней стадии со своими
+    put()/start()/join()/stop()/heartbeats(); он запускается
+    и дожидается вместе с конвейером, а его put() может ждать
+    места так же, как очередь следующей стадии.
+    """
+
+    def __init__(self, stages: List[Stage],
+                 on_error: Optional[ErrorHandler] = None,
+                 sink: Optional[object] = None) -> None:
+        self.stages = stages
+        self.sink = sink
+        for stage, next_stage in zip(stages, stages[1:] + [sink]):
+            stage.next_stage = next_stage
+        for stage in stages:
+            stage.on_error = on_error
+
+    def __getitem__(self, name: str) -> Stage:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    def heartbeats(self) -> List[Heartbeat]:
+        """Возвращает heartbeat'ы всех стадий и получателей."""
+        heartbeats = []
+        for stage in self.stages:
+            heartbeats.extend(stage.heartbeats())
+        if self.sink is not None:
+            heartbeats.extend(self.sink.heartbeats())
+        return heartbeats
+
+    def submit(self, item: object) -> None:
+        """Передаёт элемент на первую стадию."""
+        self.stages[0].put(item)
+
+    def start(self) -> None:
+        """Запускает все стадии."""
+        if self.sink is not None:
+            self.sink.start()
+        for stage in self.stages:
+            stage.start()
+
+    def join(self) -> None:
+        """Ждёт, пока все отправленные элементы пройдут конвейер."""
+        for stage in self.stages:
+            stage.inbox.join()
+        if self.sink is not None:
+            self.sink.join()
+
+    def stop(self) -> None:
+        """Дорабатывает очереди и останавливает стадии по порядку."""
+        for stage in self.stages:
+            stage.stop()
+        if self.sink is not None:
+            self.sink.stop()
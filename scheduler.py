@@ -0,0 +1,126 @@
+import heapq
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import metrics
+from clock import Clock
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+# Ожидаемая частота смены статуса (в секунду) для разных состояний
+REVIEWING_RATE = 1 / (2 * HOUR)
+ACTIVE_RATE = 1 / (12 * HOUR)
+IDLE_RATE = 1 / (7 * DAY)
+# За сколько затухает «свежесть» последнего изменения
+ACTIVE_WINDOW = 3 * DAY
+# Ниже этой вероятности изменения запрос считается пустой тратой
+MIN_PRIORITY = 0.01
+
+
+@dataclass
+class TenantState:
+    """Что планировщик знает об одном аккаунте."""
+
+    last_polled: Optional[float] = None
+    last_change: Optional[float] = None
+    statuses: Dict[str, str] = field(default_factory=dict)
+    polls: int = 0
+    forced: int = 0
+
+
+class PriorityScheduler:
+    """Распределяет общий бюджет запросов к API между аккаунтами.
+
+    Каждый тик опрашиваются аккаунты, которые иначе превысят
+    max_staleness, а оставшийся бюджет отдаётся тем, у кого
+    вероятность изменения с прошлого опроса выше: работы на ревью
+    и недавняя активность повышают её, всё принятое — понижает.
+    """
+
+    def __init__(self, clock: Clock, budget: int, max_staleness: float,
+                 tick: float) -> None:
+        self.clock = clock
+        self.budget = budget
+        self.max_staleness = max_staleness
+        self.tick = tick
+        self.states: Dict[str, TenantState] = {}
+        self.overruns = metrics.REGISTRY.counter('scheduler_budget_overrun')
+        self.unused = metrics.REGISTRY.counter('scheduler_budget_unused')
+        self.by_priority = metrics.REGISTRY.counter('scheduler_polls_priority')
+        self.by_staleness = metrics.REGISTRY.counter(
+            'scheduler_polls_staleness')
+
+    def set_tenants(self, names: Iterable[str]) -> None:
+        """Обновляет список аккаунтов, сохраняя накопленное состояние."""
+        names = list(names)
+        self.states = {name: self.states.get(name, TenantState())
+                       for name in names}
+
+    def observe(self, tenant: str, homeworks: List[dict],
+                changed: bool) -> None:
+        """Учитывает результат опроса аккаунта."""
+        state = self.states.get(tenant)
+        if state is None:
+            return
+        for homework in homeworks:
+            key = str(homework.get('id', homework.get('homework_name')))
+            state.statuses[key] = homework.get('status')
+        if changed:
+            state.last_change = self.clock.time()
+
+    def rate(self, state: TenantState, now: float) -> float:
+        """Оценивает частоту смены статусов аккаунта."""
+        rate = IDLE_RATE
+        if 'reviewing' in state.statuses.values():
+            rate += REVIEWING_RATE
+        if state.last_change is not None:
+            age = max(now - state.last_change, 0)
+            rate += ACTIVE_RATE * math.exp(-age / ACTIVE_WINDOW)
+        return rate
+
+    def priority(self, state: TenantState, now: float) -> float:
+        """Вероятность того, что с прошлого опроса что-то изменилось."""
+        if state.last_polled is None:
+            return 1.0
+        elapsed = max(now - state.last_polled, 0)
+        return 1 - math.exp(-self.rate(state, now) * elapsed)
+
+    def _stale(self, state: TenantState, now: float) -> bool:
+        # К следующему тику аккаунт превысит допустимую давность
+        return (state.last_polled is None
+                or now + self.tick - state.last_polled > self.max_staleness)
+
+    def due(self) -> List[str]:
+        """Возвращает аккаунты, которые нужно опросить в этот тик."""
+        now = self.clock.time()
+        forced = sorted(
+            (name for name, state in self.states.items()
+             if self._stale(state, now)),
+            key=lambda name: self.states[name].last_polled or 0)
+        if len(forced) > self.budget:
+            self.overruns.inc(len(forced) - self.budget)
+        rest = [(self.priority(state, now), name)
+                for name, state in self.states.items()
+                if name not in forced]
+        picked = [name for priority, name in heapq.nlargest(
+                  max(self.budget - len(forced), 0), rest)
+                  if priority >= MIN_PRIORITY]
+        self.unused.inc(max(self.budget - len(forced) - len(picked), 0))
+        self.by_staleness.inc(len(forced))
+        self.by_priority.inc(len(picked))
+        for name in forced + picked:
+            state = self.states[name]
+            state.last_polled = now
+            state.polls += 1
+            state.forced += name in forced
+        return forced + picked
+
+    def report(self) -> Dict[str, Dict]:
+        """Показывает, как бюджет распределился между аккаунтами."""
+        now = self.clock.time()
+        return {name: {'polls': state.polls,
+                       'forced': state.forced,
+                       'priority': round(self.priority(state, now), 3),
+                       'reviewing': 'reviewing' in state.statuses.values()}
+                for name, state in sorted(self.states.items())}
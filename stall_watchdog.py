@@ -0,0 +1,124 @@
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, Iterable, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Heartbeat:
+    """Отметка о работе одного потока или задачи.
+
+    Поток вызывает busy() перед единицей работы и idle() после неё;
+    ожидание новой работы зависанием не считается.
+    """
+
+    def __init__(self, name: str, deadline: float,
+                 restart: Optional[Callable[[], bool]] = None) -> None:
+        self.name = name
+        self.deadline = deadline
+        # Возвращает False, если перезапуск невозможен
+        self.restart = restart
+        self.busy_since: Optional[float] = None
+        self.retired = False
+
+    def busy(self) -> None:
+        """Отмечает начало работы."""
+        self.busy_since = time.monotonic()
+
+    def idle(self) -> None:
+        """Отмечает окончание работы."""
+        self.busy_since = None
+
+    def overdue(self, now: float) -> bool:
+        """Проверяет, не работает ли поток дольше срока."""
+        busy_since = self.busy_since
+        return (not self.retired and busy_since is not None
+                and now - busy_since > self.deadline)
+
+
+def dump_threads() -> str:
+    """Возвращает стеки всех потоков процесса."""
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    lines = []
+    for ident, frame in sys._current_frames().items():
+        lines.append(f'Поток {names.get(ident, ident)}:\n')
+        lines.extend(traceback.format_stack(frame))
+    return ''.join(lines)
+
+
+def restart_process() -> None:
+    """Перезапускает процесс бота с теми же аргументами."""
+    logging.shutdown()
+    os.execv(sys.executable, [sys.executable] + sys.argv)
+
+
+class Watchdog:
+    """Фоновый поток, который ищет зависшие стадии и восстанавливает их.
+
+    Зависшую стадию перезапускает её restart(); если перезапуск
+    невозможен, вызывает on_fatal — по умолчанию перезапуск процесса.
+    """
+
+    def __init__(self, interval: float = 30,
+                 on_fatal: Callable[[], None] = restart_process) -> None:
+        self.interval = interval
+        self.on_fatal = on_fatal
+        self._sources: List[Callable[[], Iterable[Heartbeat]]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stalls = metrics.REGISTRY.counter('watchdog_stalls')
+        self.restarts = metrics.REGISTRY.counter('watchdog_restarts')
+
+    def watch(self, source: Callable[[], Iterable[Heartbeat]]) -> None:
+        """Добавляет источник heartbeat'ов, например Pipeline.heartbeats."""
+        self._sources.append(source)
+
+    def check(self) -> None:
+        """Проверяет все heartbeat'ы один раз."""
+        now = time.monotonic()
+        for source in self._sources:
+            for heartbeat in list(source()):
+                if heartbeat.overdue(now):
+                    self._recover(heartbeat, now)
+
+    def _recover(self, heartbeat: Heartbeat, now: float) -> None:
+        self.stalls.inc()
+        metrics.REGISTRY.counter(f'watchdog_stalls_{heartbeat.name}').inc()
+        logger.critical(
+            f'{heartbeat.name} не отвечает '
+            f'{now - heartbeat.busy_since:.0f} с '
+            f'(срок {heartbeat.deadline:.0f} с). '
+            f'Стеки потоков:\n{dump_threads()}')
+        heartbeat.retired = True
+        if heartbeat.restart is not None and heartbeat.restart():
+            self.restarts.inc()
+            logger.warning(f'{heartbeat.name} перезапущен')
+            return
+        logger.critical(f'{heartbeat.name} не перезапустить, '
+                        'перезапускаем процесс')
+        self.on_fatal()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as error:
+                logger.exception(f'Сбой сторожевого потока: {error}')
+
+    def start(self) -> None:
+        """Запускает сторожевой поток."""
+        self._thread = threading.Thread(target=self._run, name='watchdog',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Останавливает сторожевой поток."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
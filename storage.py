@@ -0,0 +1,241 @@
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+DAY = 60 * 60 * 24
+HOUR = 60 * 60
+# Границы корзин длительности переходов (в секундах)
+DURATION_BUCKETS = (HOUR // 4, HOUR // 2, HOUR, 2 * HOUR, 4 * HOUR,
+                    8 * HOUR, 12 * HOUR, DAY, 2 * DAY, 3 * DAY, 5 * DAY,
+                    7 * DAY, 14 * DAY, 30 * DAY)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transitions (
+    id INTEGER PRIMARY KEY,
+    tenant TEXT NOT NULL,
+    homework_id TEXT NOT NULL,
+    project TEXT NOT NULL,
+    from_status TEXT,
+    to_status TEXT NOT NULL,
+    changed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transitions_homework
+    ON transitions (tenant, homework_id, changed_at);
+CREATE INDEX IF NOT EXISTS transitions_time
+    ON transitions (tenant, changed_at);
+CREATE TABLE IF NOT EXISTS rollups (
+    tenant TEXT NOT NULL,
+    project TEXT NOT NULL,
+    from_status TEXT NOT NULL,
+    to_status TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (from_status, to_status, day, tenant, project, bucket)
+);
+CREATE TABLE IF NOT EXISTS cursors (
+    tenant TEXT PRIMARY KEY,
+    from_date INTEGER NOT NULL
+);
+"""
+
+CURSOR_UPSERT = (
+    'INSERT INTO cursors (tenant, from_date) VALUES (?, ?) '
+    'ON CONFLICT (tenant) DO UPDATE '
+    'SET from_date = MAX(from_date, excluded.from_date)')
+
+
+def parse_date(value: Optional[str]) -> Optional[float]:
+    """Переводит date_updated из ответа API в timestamp."""
+    if not value:
+        return None
+    parsed = datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')
+    return parsed.replace(tzinfo=timezone.utc).timestamp()
+
+
+def bucket_upper(bucket: int) -> float:
+    """Возвращает верхнюю границу корзины длительности."""
+    if bucket < len(DURATION_BUCKETS):
+        return DURATION_BUCKETS[bucket]
+    return float('inf')
+
+
+class StateStore:
+    """Хранилище истории переходов статусов на SQLite.
+
+    История только дополняется. При каждой записи перехода
+    пересчитывается дневная гистограмма его длительности, поэтому
+    статистика не требует чтения всей истории.
+    """
+
+    def __init__(self, path: str = ':memory:') -> None:
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._db.close()
+
+    def get_cursor(self, tenant: str) -> Optional[int]:
+        """Возвращает from_date для следующего запроса к API."""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT from_date FROM cursors WHERE tenant = ?',
+                (tenant,)).fetchone()
+        return row[0] if row else None
+
+    def set_cursor(self, tenant: str, from_date: int) -> None:
+        """Сохраняет from_date для следующего запроса к API.
+
+        Курсор только растёт: запоздавший ответ не вернёт его назад.
+        """
+        with self._lock, self._db:
+            self._db.execute(CURSOR_UPSERT, (tenant, from_date))
+
+    def last_transition(self, tenant: str,
+                        homework_id: str) -> Optional[tuple]:
+        """Возвращает последний статус работы и время его установки."""
+        with self._lock:
+            return self._last_transition(tenant, homework_id)
+
+    def _last_transition(self, tenant: str,
+                         homework_id: str) -> Optional[tuple]:
+        return self._db.execute(
+            'SELECT to_status, changed_at FROM transitions '
+            'WHERE tenant = ? AND homework_id = ? '
+            'ORDER BY changed_at DESC, id DESC LIMIT 1',
+            (tenant, homework_id)).fetchone()
+
+    def current_statuses(self, tenant: str) -> List[dict]:
+        """Возвращает последний известный статус каждой работы аккаунта."""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT homework_id, to_status FROM transitions '
+                'WHERE id IN (SELECT MAX(id) FROM transitions '
+                'WHERE tenant = ? GROUP BY homework_id)',
+                (tenant,)).fetchall()
+        return [{'id': homework_id, 'status': status}
+                for homework_id, status in rows]
+
+    def record(self, tenant: str, homework: dict,
+               now: Optional[float] = None) -> bool:
+        """Записывает статус работы, если он изменился.
+
+        Возвращает True, если статус новый.
+        """
+        with self._lock, self._db:
+            return self._record(tenant, homework, now)
+
+    def record_many(self, tenant: str, homeworks: List[dict],
+                    cursor: Optional[int] = None,
+                    now: Optional[float] = None) -> int:
+        """Записывает пачку статусов и курсор одной транзакцией.
+
+        Возвращает число новых статусов.
+        """
+        with self._lock, self._db:
+            recorded = sum(self._record(tenant, homework, now)
+                           for homework in homeworks)
+            if cursor is not None:
+                self._db.execute(CURSOR_UPSERT, (tenant, cursor))
+        return recorded
+
+    def _record(self, tenant: str, homework: dict,
+                now: Optional[float]) -> bool:
+        homework_id = str(homework.get('id', homework.get('homework_name')))
+        project = homework.get('lesson_name') or homework.get(
+            'homework_name', '')
+        status = homework.get('status')
+        changed_at = parse_date(homework.get('date_updated'))
+        if changed_at is None:
+            changed_at = time.time() if now is None else now
+        last = self._last_transition(tenant, homework_id)
+        if last is not None and last[0] == status:
+            return False
+        self._append(tenant, homework_id, project, last, status, changed_at)
+        return True
+
+    def _append(self, tenant: str, homework_id: str, project: str,
+                last: Optional[tuple], status: str,
+                changed_at: float) -> None:
+        from_status = last[0] if last else None
+        self._db.execute(
+            'INSERT INTO transitions (tenant, homework_id, project, '
+            'from_status, to_status, changed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (tenant, homework_id, project, from_status, status, changed_at))
+        if last is None:
+            return
+        duration = max(changed_at - last[1], 0)
+        self._db.execute(
+            'INSERT INTO rollups (tenant, project, from_status, to_status, '
+            'day, bucket, count) VALUES (?, ?, ?, ?, ?, ?, 1) '
+            'ON CONFLICT (from_status, to_status, day, tenant, project, '
+            'bucket) DO UPDATE SET count = count + 1',
+            (tenant, project, from_status, status,
+             int(changed_at // DAY), bisect_left(DURATION_BUCKETS, duration)))
+
+    def stats(self, from_status: str, to_status: str, days: int = 90,
+              tenant: Optional[str] = None,
+              now: Optional[float] = None) -> List[Dict]:
+        """Считает длительность переходов по проектам за период.
+
+        Медиана и 90-й перцентиль оцениваются по верхней границе
+        корзины гистограммы.
+        """
+        now = time.time() if now is None else now
+        query = ('SELECT project, bucket, SUM(count) FROM rollups '
+                 'WHERE from_status = ? AND to_status = ? AND day >= ?')
+        params = [from_status, to_status, int((now - days * DAY) // DAY)]
+        if tenant is not None:
+            query += ' AND tenant = ?'
+            params.append(tenant)
+        query += ' GROUP BY project, bucket ORDER BY project, bucket'
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        projects: Dict[str, List[tuple]] = {}
+        for project, bucket, count in rows:
+            projects.setdefault(project, []).append((bucket, count))
+        return [{'project': project,
+                 'count': sum(count for _, count in buckets),
+                 'median': _quantile(buckets, 0.5),
+                 'p90': _quantile(buckets, 0.9)}
+                for project, buckets in projects.items()]
+
+
+def _quantile(buckets: List[tuple], q: float) -> float:
+    total = sum(count for _, count in buckets)
+    seen = 0
+    for bucket, count in buckets:
+        seen += count
+        if seen >= q * total:
+            return bucket_upper(bucket)
+    return bucket_upper(buckets[-1][0])
+
+
+def format_duration(seconds: float) -> str:
+    """Форматирует длительность для человека."""
+    if seconds == float('inf'):
+        return f'>{DURATION_BUCKETS[-1] // DAY}д'
+    if seconds >= DAY:
+        return f'≤{seconds / DAY:g}д'
+    return f'≤{seconds / HOUR:g}ч'
+
+
+def format_stats(rows: List[Dict], from_status: str, to_status: str,
+                 days: int) -> str:
+    """Форматирует статистику в текст для консоли и Telegram."""
+    if not rows:
+        return (f'Нет переходов {from_status} → {to_status} '
+                f'за {days} дн.')
+    lines = [f'{from_status} → {to_status} за {days} дн.:']
+    for row in rows:
+        lines.append(f'{row["project"]}: {row["count"]} шт., '
+                     f'медиана {format_duration(row["median"])}, '
+                     f'p90 {format_duration(row["p90"])}')
+    return '\n'.join(lines)
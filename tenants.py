@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """Аккаунт Практикума и чаты, куда отправлять его обновления."""
+
+    name: str
+    practicum_token: str
+    chat_ids: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class Config:
+    """Содержимое файла настроек; отсутствующие ключи — None."""
+
+    tenants: Tuple[Tenant, ...]
+    retry_time: Optional[int] = None
+    max_staleness: Optional[int] = None
+    request_budget: Optional[int] = None
+    homework_statuses: Optional[Dict[str, str]] = None
+
+
+def _positive_int(data: dict, key: str, path: str,
+                  minimum: int = 1) -> Optional[int]:
+    value = data.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError(f'{key} в {path} должен быть целым числом')
+    if value < minimum:
+        raise ValueError(f'{key} в {path} должен быть не меньше {minimum}')
+    return value
+
+
+def _load_tenant(item: object, path: str) -> Tenant:
+    if not isinstance(item, dict):
+        raise TypeError(f'Аккаунт {item!r} в {path} должен быть объектом')
+    try:
+        name = str(item['name'])
+        token = str(item['practicum_token'])
+        chat_ids = item['chat_ids']
+    except KeyError as error:
+        raise KeyError(
+            f'В описании аккаунта {item} нет ключа {error}') from error
+    # Строка тоже итерируема: "123" превратилась бы в чаты 1, 2 и 3
+    if not isinstance(chat_ids, list) or not all(
+            isinstance(chat_id, (str, int)) and not isinstance(chat_id, bool)
+            for chat_id in chat_ids):
+        raise TypeError(f'chat_ids аккаунта {name} в {path} '
+                        'должен быть списком строк или чисел')
+    return Tenant(name=name, practicum_token=token,
+                  chat_ids=tuple(str(chat_id) for chat_id in chat_ids))
+
+
+def load_config(path: str) -> Config:
+    """Читает настройки и аккаунты из JSON-файла.
+
+    Формат: {"retry_time": 600, "max_staleness": 3600,
+    "request_budget": 10, "homework_statuses": {"approved": "..."},
+    "tenants": [{"name": "...", "practicum_token": "...",
+    "chat_ids": ["...", ...]}, ...]}
+
+    Неверные типы и значения вызывают TypeError и ValueError
+    до того, как настройки попадут в работающего бота.
+    """
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+    if not isinstance(data, dict):
+        raise TypeError(f'Настройки в {path} должны быть объектом')
+    items = data.get('tenants', [])
+    if not isinstance(items, list):
+        raise TypeError(f'tenants в {path} должен быть списком')
+    tenants = [_load_tenant(item, path) for item in items]
+    names = [tenant.name for tenant in tenants]
+    if len(set(names)) != len(names):
+        raise ValueError(f'Имена аккаунтов в {path} повторяются')
+    statuses = data.get('homework_statuses')
+    if statuses is not None and not (
+            isinstance(statuses, dict)
+            and all(isinstance(text, str) for text in statuses.values())):
+        raise TypeError(f'homework_statuses в {path} должен быть словарём '
+                        'строк')
+    return Config(tenants=tuple(tenants),
+                  retry_time=_positive_int(data, 'retry_time', path),
+                  max_staleness=_positive_int(data, 'max_staleness', path),
+                  request_budget=_positive_int(data, 'request_budget', path,
+                                               minimum=0),
+                  homework_statuses=statuses)
+
+
+def load_tenants(path: str) -> List[Tenant]:
+    """Читает аккаунты из JSON-файла настроек."""
+    return list(load_config(path).tenants)
+
+
+class ConfigWatcher:
+    """Следит за файлом настроек: по изменению mtime или по запросу.
+
+    request() безопасно вызывать из обработчика сигнала — он лишь
+    выставляет флаг, а файл читается в потоке опроса.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._requested = threading.Event()
+        self._mtime = self._current_mtime()
+
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def request(self, *args) -> None:
+        """Просит перечитать файл при следующей проверке."""
+        self._requested.set()
+
+    def poll(self) -> Optional[Config]:
+        """Возвращает новые настройки, если файл изменился или запрошен."""
+        mtime = self._current_mtime()
+        if mtime == self._mtime and not self._requested.is_set():
+            return None
+        self._requested.clear()
+        self._mtime = mtime
+        return load_config(self.path)
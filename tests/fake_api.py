@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+
+class FakeResponse:
+
+    def __init__(self, homeworks, current_date):
+        self.status_code = HTTPStatus.OK
+        self.data = {'homeworks': homeworks, 'current_date': current_date}
+
+    def json(self):
+        return self.data
+
+
+class FakePracticumAPI:
+    """Заменяет эндпоинт homework_statuses в тестах.
+
+    Отдаёт заданные смены статусов по показаниям часов, поэтому
+    вместе с SimulatedClock быстро проигрывает долгие периоды.
+    """
+
+    def __init__(self, clock, events):
+        self.clock = clock
+        # (время, homework_name, статус), по возрастанию времени
+        self.events = sorted(events)
+        self.requests = 0
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        self.requests += 1
+        now = self.clock.time()
+        latest = {}
+        for at, name, status in self.events:
+            if at > now:
+                break
+            latest[name] = (at, status)
+        homeworks = [
+            {'id': name, 'homework_name': name, 'lesson_name': 'Проект',
+             'status': status,
+             'date_updated': datetime.fromtimestamp(
+                 at, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}
+            for name, (at, status) in latest.items()
+            if at >= params['from_date']
+        ]
+        return FakeResponse(homeworks, int(now))
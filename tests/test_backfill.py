@@ -0,0 +1,90 @@
+import pytest
+import requests
+
+from clock import SimulatedClock
+from fake_api import FakePracticumAPI
+from storage import DAY, StateStore
+from tenants import Tenant
+from test_pipeline import RecordingBot
+
+NOW = 1640995200  # 2022-01-01
+
+
+class TestBackfill:
+
+    def test_backfill_loads_history_without_notifications(self,
+                                                          monkeypatch):
+        import homework
+
+        events = [(NOW - 700 * DAY, 'old', 'approved'),
+                  (NOW - 200 * DAY, 'mid', 'rejected'),
+                  (NOW - 100 * DAY, 'mid', 'approved'),
+                  (NOW - DAY, 'new', 'reviewing'),
+                  (NOW, 'edge', 'reviewing')]
+        clock = SimulatedClock(start=NOW)
+        api = FakePracticumAPI(clock, events)
+        store = StateStore()
+        tenant = Tenant(name='student', practicum_token='token',
+                        chat_ids=('1',))
+        monkeypatch.setattr(homework, 'CLOCK', clock)
+        monkeypatch.setattr(requests, 'get', api.get)
+
+        recorded = homework.backfill_tenant(tenant, store)
+        assert recorded == 4, (
+            'Каждая работа должна попасть в хранилище один раз '
+            'с последним статусом'
+        )
+        assert api.requests == 1, (
+            'API отдаёт всю историю с from_date, окна не нужны'
+        )
+        assert store.get_cursor('student') == NOW
+        assert store.last_transition('student', 'mid')[0] == 'approved'
+
+        bot = RecordingBot()
+        scheduler = homework.build_scheduler([tenant], clock)
+        pipeline = homework.build_pipeline(bot, store, scheduler)
+        clock.on_sleep.append(pipeline.join)
+        pipeline.start()
+        homework.run_polling(pipeline, scheduler, {tenant.name: tenant},
+                             clock, cycles=3)
+        pipeline.stop()
+        assert bot.sent == [], (
+            'После загрузки истории не должно быть сообщений о старых статусах'
+        )
+
+    def test_failed_tenant_does_not_stop_others(self, monkeypatch, tmp_path,
+                                                capsys):
+        import homework
+
+        clock = SimulatedClock(start=NOW)
+        api = FakePracticumAPI(clock, [(NOW - DAY, 'hw1', 'approved')])
+
+        def get(url, headers=None, params=None, **kwargs):
+            if headers['Authorization'] == 'OAuth bad':
+                raise requests.ConnectionError('token rejected')
+            return api.get(url, headers=headers, params=params, **kwargs)
+
+        tenants = [Tenant(name=name, practicum_token=name, chat_ids=('1',))
+                   for name in ('first', 'bad', 'second')]
+        monkeypatch.setattr(homework, 'CLOCK', clock)
+        monkeypatch.setattr(homework, 'get_tenants', lambda: tenants)
+        monkeypatch.setattr(requests, 'get', get)
+        db = str(tmp_path / 'state.sqlite3')
+
+        with pytest.raises(SystemExit) as exit_info:
+            homework.cli(['backfill', '--db', db, '--workers', '2'])
+        assert exit_info.value.code == 1, (
+            'Сбой одного аккаунта должен давать ненулевой код выхода'
+        )
+        assert 'Не загружены аккаунты: bad' in capsys.readouterr().err
+        store = StateStore(db)
+        assert store.get_cursor('first') == NOW
+        assert store.get_cursor('second') == NOW, (
+            'Ошибка одного аккаунта не должна мешать остальным'
+        )
+        store.close()
+
+        with pytest.raises(SystemExit) as exit_info:
+            homework.cli(['backfill', '--db', db, '--tenant', 'missing'])
+        assert exit_info.value.code == 1
+        assert 'missing не найден' in capsys.readouterr().err
@@ -0,0 +1,100 @@
+import random
+
+import requests
+
+import metrics
+from clock import SimulatedClock
+from fake_api import FakePracticumAPI
+from storage import DAY, StateStore
+from test_pipeline import RecordingBot
+
+START = 1640995200  # 2022-01-01
+
+
+class TestSimulatedClock:
+
+    def test_sleep_advances_time_and_runs_callbacks(self):
+        calls = []
+        clock = SimulatedClock(start=100, on_sleep=[lambda: calls.append(1)])
+        clock.sleep(600)
+        assert clock.time() == 700
+        assert calls == [1]
+
+    def test_replay_month_of_polling(self, monkeypatch):
+        import homework
+
+        rnd = random.Random(0)
+        events = []
+        for number in range(20):
+            taken = START + rnd.randint(DAY, 25 * DAY)
+            events.append((taken, f'hw{number}', 'reviewing'))
+            events.append((taken + rnd.randint(600, 3 * DAY),
+                           f'hw{number}', 'approved'))
+        clock = SimulatedClock(start=START)
+        api = FakePracticumAPI(clock, events)
+        store = StateStore()
+        bot = RecordingBot()
+        monkeypatch.setattr(homework, 'CLOCK', clock)
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', '1')
+        monkeypatch.setattr(requests, 'get', api.get)
+        tenants = homework.get_tenants()
+        scheduler = homework.build_scheduler(tenants, clock)
+        pipeline = homework.build_pipeline(bot, store, scheduler)
+        clock.on_sleep.append(pipeline.join)
+        lag = metrics.REGISTRY.histogram('notification_lag_seconds',
+                                         homework.LAG_BUCKETS)
+        poll_wait = metrics.REGISTRY.histogram(
+            'notification_lag_poll_wait_seconds', homework.LAG_BUCKETS)
+        lag_before, wait_before = lag.count, poll_wait.count
+        sum_before = lag.sum
+        pipeline.start()
+        cycles = 30 * DAY // homework.RETRY_TIME
+        homework.run_polling(pipeline, scheduler,
+                             {tenant.name: tenant for tenant in tenants},
+                             clock, cycles=cycles)
+        pipeline.join()
+        pipeline.stop()
+
+        assert api.requests == cycles
+        assert store.get_cursor(homework.TENANT) == (
+            START + (cycles - 1) * homework.RETRY_TIME), (
+            'Курсор должен сдвигаться на current_date последнего ответа'
+        )
+        assert len(bot.sent) == len(events), (
+            'Каждый переход должен быть отправлен ровно один раз'
+        )
+        assert lag.count - lag_before == len(events), (
+            'Задержка должна учитываться для каждого доставленного перехода'
+        )
+        assert poll_wait.count - wait_before == len(events)
+        assert (lag.sum - sum_before) / len(events) <= homework.RETRY_TIME, (
+            'Средняя задержка не может превышать интервал опроса'
+        )
+        rows = store.stats('reviewing', 'approved', now=clock.time())
+        assert rows[0]['count'] == 20
+
+    def test_lag_counts_owner_chat_despite_other_failures(self, monkeypatch):
+        import homework
+        import notifiers
+
+        clock = SimulatedClock(start=START + 600)
+        monkeypatch.setattr(homework, 'CLOCK', clock)
+        lag = metrics.REGISTRY.histogram('notification_lag_seconds',
+                                         homework.LAG_BUCKETS)
+        before = lag.count
+        cycle = homework.Cycle(chat_ids=('owner', 'mentor'),
+                               fetch_started=START + 300,
+                               fetch_finished=START + 301)
+        notification = homework.Notification(
+            cycle, {'homework_name': 'hw1',
+                    'date_updated': '2022-01-01T00:00:00Z'},
+            enqueued_at=START + 302)
+        mentor_down = notifiers.PartialDeliveryError(
+            ('owner',), {'mentor': Exception('chat not found')})
+        owner_down = notifiers.PartialDeliveryError(
+            ('mentor',), {'owner': Exception('chat not found')})
+        homework.delivered(notification, 'telegram', mentor_down, 0, 0)
+        homework.delivered(notification, 'telegram', owner_down, 0, 0)
+        assert lag.count - before == 1, (
+            'Задержка считается, если сообщение дошло до владельца'
+        )
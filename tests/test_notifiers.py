@@ -0,0 +1,107 @@
+import json
+import threading
+
+import pytest
+
+import notifiers
+from test_pipeline import FailingChatBot
+
+
+class SlowNotifier(notifiers.Notifier):
+
+    name = 'slow'
+
+    def __init__(self):
+        super().__init__(concurrency=1, batch_size=1)
+        self.release = threading.Event()
+
+    async def deliver_batch(self, notices):
+        await self.run_blocking(self.release.wait, 5)
+        return [None] * len(notices)
+
+
+class TestDispatcher:
+
+    def test_slow_backend_does_not_block_others(self, tmp_path):
+        path = tmp_path / 'notifications.jsonl'
+        slow = SlowNotifier()
+        file_sink = notifiers.FileNotifier(str(path), batch_size=50)
+        file_done = threading.Event()
+        delivered = []
+
+        def on_done(backend, error, started, finished):
+            delivered.append((backend, error))
+            if backend == 'file' and len(
+                    [name for name, _ in delivered if name == 'file']) == 100:
+                file_done.set()
+
+        dispatcher = notifiers.Dispatcher([slow, file_sink])
+        dispatcher.start()
+        for number in range(100):
+            dispatcher.put(notifiers.Notice(
+                tenant='t', chat_ids=('1',), text=f'msg{number}',
+                on_done=on_done))
+        assert file_done.wait(5), (
+            'Файловый бэкенд не должен ждать медленный бэкенд'
+        )
+        assert not any(name == 'slow' for name, _ in delivered)
+        slow.release.set()
+        dispatcher.stop()
+
+        lines = path.read_text(encoding='utf-8').splitlines()
+        assert [json.loads(line)['text'] for line in lines] == [
+            f'msg{number}' for number in range(100)]
+        assert len(delivered) == 200
+        assert all(error is None for _, error in delivered)
+
+    def test_full_queue_waits_instead_of_dropping(self):
+        slow = SlowNotifier()
+        dispatcher = notifiers.Dispatcher([slow], queue_size=1)
+        dispatcher.start()
+        delivered = []
+        # Первое сообщение уже у обработчика, второе занимает очередь
+        for number in range(2):
+            dispatcher.put(notifiers.Notice(
+                tenant='t', chat_ids=('1',), text=f'msg{number}',
+                on_done=lambda *args: delivered.append(args)))
+        waiting = threading.Thread(target=dispatcher.put, args=(
+            notifiers.Notice(tenant='t', chat_ids=('1',), text='msg2',
+                             on_done=lambda *args: delivered.append(args)),))
+        waiting.start()
+        waiting.join(0.2)
+        assert waiting.is_alive(), (
+            'Проверьте, что put() ждёт места в очереди бэкенда'
+        )
+        slow.release.set()
+        waiting.join(5)
+        dispatcher.stop()
+        assert len(delivered) == 3
+        assert all(error is None for _, error, _, _ in delivered), (
+            'Сообщения не должны теряться при переполнении очереди'
+        )
+
+
+class TestTelegramNotifier:
+
+    def test_fans_out_to_all_chats(self):
+        bot = FailingChatBot()
+        notifier = notifiers.TelegramNotifier(bot)
+        errors = notifier.deliver([notifiers.Notice(
+            tenant='t', chat_ids=('1', 'broken', '3'), text='текст')])
+        notifier.close()
+        assert sorted(bot.sent) == [('1', 'текст'), ('3', 'текст')], (
+            'Проверьте, что ошибка в одном чате не мешает отправке в другие'
+        )
+        assert isinstance(errors[0], notifiers.PartialDeliveryError), (
+            'Частичная доставка должна отличаться от полного сбоя'
+        )
+        assert errors[0].delivered == ('1', '3')
+        assert list(errors[0].failed) == ['broken']
+
+    def test_webhook_requires_url(self, monkeypatch):
+        import homework
+
+        monkeypatch.setattr(homework, 'NOTIFIERS', ['telegram', 'webhook'])
+        monkeypatch.setattr(homework, 'WEBHOOK_URL', None)
+        with pytest.raises(ValueError):
+            homework.build_notifiers(FailingChatBot())
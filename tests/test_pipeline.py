@@ -0,0 +1,101 @@
+import threading
+
+import requests
+import telegram
+
+from pipeline import Pipeline, Stage
+
+
+class FakeResponse:
+
+    status_code = 200
+
+    def __init__(self, homeworks, current_date=0):
+        self.homeworks = homeworks
+        self.current_date = current_date
+
+    def json(self):
+        return {'homeworks': self.homeworks,
+                'current_date': self.current_date}
+
+
+class RecordingBot:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        with self.lock:
+            self.sent.append((chat_id, text))
+
+
+class FailingChatBot(RecordingBot):
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if chat_id == 'broken':
+            raise telegram.TelegramError('chat not found')
+        super().send_message(chat_id=chat_id, text=text, **kwargs)
+
+
+class TestPipeline:
+
+    def test_stages_pass_items_in_order(self):
+        results = []
+        pipeline = Pipeline([
+            Stage('double', lambda x: [x * 2], maxsize=1),
+            Stage('split', lambda x: [x, x + 1], maxsize=1),
+            Stage('collect', results.append, maxsize=1),
+        ])
+        pipeline.start()
+        for number in range(5):
+            pipeline.submit(number)
+        pipeline.join()
+        pipeline.stop()
+        assert results == [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], (
+            'Проверьте, что стадии передают элементы дальше по порядку'
+        )
+
+    def test_stage_error_does_not_stop_worker(self):
+        errors = []
+        results = []
+
+        def fail_on_odd(number):
+            if number % 2:
+                raise ValueError(number)
+            return [number]
+
+        pipeline = Pipeline(
+            [Stage('check', fail_on_odd), Stage('collect', results.append)],
+            on_error=lambda stage, item, error: errors.append(stage))
+        pipeline.start()
+        for number in range(4):
+            pipeline.submit(number)
+        pipeline.join()
+        pipeline.stop()
+        assert results == [0, 2]
+        assert errors == ['check', 'check']
+
+    def test_homework_pipeline_sends_only_changes(self, monkeypatch):
+        import homework
+
+        homeworks = [{'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'}]
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', 12345)
+        monkeypatch.setattr(
+            requests, 'get', lambda *args, **kwargs: FakeResponse(homeworks))
+        bot = RecordingBot()
+        pipeline = homework.build_pipeline(bot)
+        pipeline.start()
+        pipeline.submit(homework.Cycle(token='token'))
+        pipeline.submit(homework.Cycle(token='token'))
+        pipeline.join()
+        homeworks[0]['status'] = 'approved'
+        pipeline.submit(homework.Cycle(token='token'))
+        pipeline.join()
+        pipeline.stop()
+        assert [text for _, text in bot.sent] == [
+            'Изменился статус проверки работы "hw1".'
+            + homework.HOMEWORK_STATUSES['reviewing'],
+            'Изменился статус проверки работы "hw1".'
+            + homework.HOMEWORK_STATUSES['approved'],
+        ]
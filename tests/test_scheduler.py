@@ -0,0 +1,47 @@
+from clock import SimulatedClock
+from scheduler import PriorityScheduler
+
+TICK = 600
+
+
+class TestPriorityScheduler:
+
+    def make_scheduler(self, budget, max_staleness):
+        clock = SimulatedClock(start=0)
+        scheduler = PriorityScheduler(clock, budget=budget,
+                                      max_staleness=max_staleness, tick=TICK)
+        scheduler.set_tenants(['busy', 'idle1', 'idle2', 'idle3'])
+        return clock, scheduler
+
+    def test_budget_goes_to_reviewing_tenant(self):
+        clock, scheduler = self.make_scheduler(budget=1,
+                                               max_staleness=24 * TICK)
+        # первый тик: бюджет превышен, но все аккаунты опрашиваются
+        assert len(scheduler.due()) == 4
+        scheduler.observe('busy', [{'id': 1, 'status': 'reviewing'}],
+                          changed=True)
+        for name in ('idle1', 'idle2', 'idle3'):
+            scheduler.observe(name, [{'id': 1, 'status': 'approved'}],
+                              changed=False)
+        polled = []
+        for _ in range(23):
+            clock.sleep(TICK)
+            polled.extend(scheduler.due())
+        report = scheduler.report()
+        assert report['busy']['polls'] > report['idle1']['polls'], (
+            'Аккаунт с работой на ревью должен опрашиваться чаще'
+        )
+        assert polled.count('busy') >= 20
+
+    def test_max_staleness_is_guaranteed(self):
+        clock, scheduler = self.make_scheduler(budget=1,
+                                               max_staleness=6 * TICK)
+        last_polled = {}
+        for tick in range(60):
+            for name in scheduler.due():
+                last_polled[name] = clock.time()
+            for name, polled_at in last_polled.items():
+                assert clock.time() - polled_at <= 6 * TICK, (
+                    f'Аккаунт {name} не опрашивался дольше max_staleness'
+                )
+            clock.sleep(TICK)
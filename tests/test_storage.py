@@ -0,0 +1,76 @@
+from storage import DAY, HOUR, StateStore, format_stats
+
+
+def homework(status, date_updated, name='hw1', lesson='Проект'):
+    return {'id': name, 'homework_name': name, 'lesson_name': lesson,
+            'status': status, 'date_updated': date_updated}
+
+
+class TestStateStore:
+
+    def test_record_only_changes(self):
+        store = StateStore()
+        assert store.record('t', homework('reviewing',
+                                          '2022-01-01T10:00:00Z'))
+        assert not store.record('t', homework('reviewing',
+                                              '2022-01-01T10:00:00Z')), (
+            'Повторный статус не должен считаться переходом'
+        )
+        assert store.record('t', homework('approved',
+                                          '2022-01-01T12:30:00Z'))
+        assert store.last_transition('t', 'hw1')[0] == 'approved'
+
+    def test_stats_from_rollups(self):
+        store = StateStore()
+        for number, hours in enumerate((1, 3, 3, 30)):
+            name = f'hw{number}'
+            store.record('t', homework('reviewing', '2022-01-01T00:00:00Z',
+                                       name=name))
+            store.record('t', homework(
+                'approved', f'2022-01-0{1 + hours // 24}T'
+                            f'{hours % 24:02d}:00:00Z', name=name))
+        now = 1641081600 + DAY
+        rows = store.stats('reviewing', 'approved', days=90, now=now)
+        assert rows == [{'project': 'Проект', 'count': 4,
+                         'median': 4 * HOUR, 'p90': 2 * DAY}]
+        assert store.stats('reviewing', 'approved', days=90,
+                           now=now + 100 * DAY) == []
+        assert store.stats('reviewing', 'approved', tenant='other',
+                           now=now) == []
+        assert 'медиана ≤4ч' in format_stats(rows, 'reviewing',
+                                              'approved', 90)
+
+    def test_stats_command_matches_group_username(self):
+        from homework import stats_command
+
+        class Message:
+            replies = []
+
+            def reply_text(self, text):
+                self.replies.append(text)
+
+        class Update:
+            effective_chat = type('Chat', (), {'id': -100,
+                                               'username': 'group'})
+            # Исправленная команда приходит в edited_message
+            message = None
+            effective_message = Message()
+
+        store = StateStore()
+        store.record('a', homework('reviewing', '2022-01-01T00:00:00Z'))
+        context = type('Context', (), {'args': []})
+        stats_command(Update(), context, store, {'@group': 'a'})
+        stats_command(Update(), context, store, {'1': 'a'})
+        assert len(Message.replies) == 1, (
+            'Проверьте, что публичная группа узнаётся по @username'
+        )
+
+    def test_cursor_only_moves_forward(self):
+        store = StateStore()
+        store.set_cursor('t', 200)
+        store.set_cursor('t', 100)
+        assert store.get_cursor('t') == 200, (
+            'Запоздавший ответ не должен сдвигать курсор назад'
+        )
+        store.record_many('t', [], cursor=300)
+        assert store.get_cursor('t') == 300
@@ -0,0 +1,196 @@
+import json
+import os
+
+import pytest
+import requests
+
+from clock import SimulatedClock
+from fake_api import FakePracticumAPI
+from storage import StateStore
+from tenants import Config, ConfigWatcher, load_config
+from test_pipeline import RecordingBot
+
+START = 1640995200
+
+
+def write_config(path, tenants, **settings):
+    data = dict(settings, tenants=[
+        {'name': name, 'practicum_token': name, 'chat_ids': [chat_id]}
+        for name, chat_id in tenants])
+    path.write_text(json.dumps(data), encoding='utf-8')
+    # mtime должен измениться даже при быстрой перезаписи
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+class TestConfigReload:
+
+    def test_watcher_reports_changes_and_requests(self, tmp_path):
+        path = tmp_path / 'tenants.json'
+        write_config(path, [('a', '1')])
+        watcher = ConfigWatcher(str(path))
+        assert watcher.poll() is None
+        write_config(path, [('a', '1'), ('b', '2')], retry_time=60)
+        config = watcher.poll()
+        assert [tenant.name for tenant in config.tenants] == ['a', 'b']
+        assert config.retry_time == 60
+        assert watcher.poll() is None
+        watcher.request()
+        assert watcher.poll() == config
+
+    def test_reload_applies_without_restart(self, monkeypatch, tmp_path):
+        import homework
+
+        for name in ('RETRY_TIME', 'MAX_STALENESS', 'REQUEST_BUDGET',
+                     'HOMEWORK_STATUSES'):
+            monkeypatch.setattr(homework, name, getattr(homework, name))
+        path = tmp_path / 'tenants.json'
+        write_config(path, [('a', '1')])
+        clock = SimulatedClock(start=START)
+        api = FakePracticumAPI(clock, [
+            (START + 100, 'hw1', 'reviewing'),
+            (START + 1250, 'hw2', 'approved'),
+        ])
+        bot = RecordingBot()
+        monkeypatch.setattr(homework, 'CLOCK', clock)
+        monkeypatch.setattr(requests, 'get', api.get)
+
+        tenants, chat_tenants = {}, {}
+        scheduler = homework.build_scheduler([], clock)
+        homework.apply_config(load_config(str(path)), scheduler, tenants,
+                              chat_tenants)
+        watcher = ConfigWatcher(str(path))
+        pipeline = homework.build_pipeline(bot, StateStore(), scheduler)
+        clock.on_sleep.append(pipeline.join)
+        pipeline.start()
+        on_tick = lambda: homework.reload_config(  # noqa: E731
+            watcher, scheduler, tenants, chat_tenants)
+        homework.run_polling(pipeline, scheduler, tenants, clock, cycles=2,
+                             on_tick=on_tick)
+        assert [chat for chat, _ in bot.sent] == ['1']
+
+        write_config(path, [('b', '2')], retry_time=60,
+                     homework_statuses={'approved': 'Принято!'})
+        before = clock.time()
+        homework.run_polling(pipeline, scheduler, tenants, clock, cycles=3,
+                             on_tick=on_tick)
+        pipeline.stop()
+
+        assert list(tenants) == ['b']
+        assert chat_tenants == {'2': 'b'}
+        assert clock.time() - before == 3 * 60, (
+            'Новый RETRY_TIME должен применяться без перезапуска'
+        )
+        assert ('2', 'Изменился статус проверки работы '
+                     '"hw2".Принято!') in bot.sent, (
+            'Новые шаблоны сообщений должны применяться без перезапуска'
+        )
+
+    def test_broken_config_keeps_old_settings(self, tmp_path):
+        import homework
+
+        path = tmp_path / 'tenants.json'
+        write_config(path, [('a', '1')])
+        watcher = ConfigWatcher(str(path))
+        tenants = {}
+        scheduler = homework.build_scheduler([])
+        homework.apply_config(Config(tenants=load_config(str(path)).tenants),
+                              scheduler, tenants, {})
+        path.write_text('{', encoding='utf-8')
+        watcher.request()
+        homework.reload_config(watcher, scheduler, tenants, {})
+        assert list(tenants) == ['a']
+
+    def test_bad_chat_id_keeps_old_settings(self, monkeypatch, tmp_path):
+        import homework
+
+        for name in ('RETRY_TIME', 'MAX_STALENESS', 'REQUEST_BUDGET',
+                     'HOMEWORK_STATUSES'):
+            monkeypatch.setattr(homework, name, getattr(homework, name))
+        path = tmp_path / 'tenants.json'
+        write_config(path, [('a', '1'), ('b', '@group')])
+        watcher = ConfigWatcher(str(path))
+        tenants, chat_tenants = {}, {}
+        scheduler = homework.build_scheduler([])
+        homework.apply_config(load_config(str(path)), scheduler, tenants,
+                              chat_tenants)
+        assert chat_tenants == {'1': 'a', '@group': 'b'}, (
+            'Каналы по @username должны приниматься как есть'
+        )
+        retry_time = homework.RETRY_TIME
+
+        write_config(path, [('c', 'not a chat')], retry_time=60)
+        homework.reload_config(watcher, scheduler, tenants, chat_tenants)
+        assert list(tenants) == ['a', 'b']
+        assert chat_tenants == {'1': 'a', '@group': 'b'}
+        assert set(scheduler.states) == {'a', 'b'}
+        assert homework.RETRY_TIME == retry_time, (
+            'Ошибка в настройках не должна применять их частично'
+        )
+
+    @pytest.mark.parametrize('data, error', [
+        ({'retry_time': '600'}, TypeError),
+        ({'retry_time': -1}, ValueError),
+        ({'max_staleness': 0}, ValueError),
+        ({'request_budget': '10'}, TypeError),
+        ({'request_budget': -1}, ValueError),
+        ({'homework_statuses': {'approved': 1}}, TypeError),
+        ({'tenants': {'name': 'a'}}, TypeError),
+        ({'tenants': [{'name': 'a', 'practicum_token': 'a',
+                       'chat_ids': '123'}]}, TypeError),
+        ([], TypeError),
+    ])
+    def test_invalid_config_is_rejected(self, tmp_path, data, error):
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps(data), encoding='utf-8')
+        with pytest.raises(error):
+            load_config(str(path))
+
+    def test_zero_request_budget_is_allowed(self, tmp_path):
+        path = tmp_path / 'tenants.json'
+        write_config(path, [('a', '1')], request_budget=0)
+        assert load_config(str(path)).request_budget == 0
+
+    def test_invalid_reload_keeps_polling(self, monkeypatch, tmp_path):
+        import homework
+
+        for name in ('RETRY_TIME', 'MAX_STALENESS', 'REQUEST_BUDGET',
+                     'HOMEWORK_STATUSES'):
+            monkeypatch.setattr(homework, name, getattr(homework, name))
+        path = tmp_path / 'tenants.json'
+        write_config(path, [('a', '1')])
+        watcher = ConfigWatcher(str(path))
+        tenants, chat_tenants = {}, {}
+        scheduler = homework.build_scheduler([])
+        homework.apply_config(load_config(str(path)), scheduler, tenants,
+                              chat_tenants)
+        retry_time = homework.RETRY_TIME
+        for data in ({'retry_time': '600', 'tenants': []}, []):
+            path.write_text(json.dumps(data), encoding='utf-8')
+            watcher.request()
+            homework.reload_config(watcher, scheduler, tenants, chat_tenants)
+            assert homework.RETRY_TIME == retry_time
+            assert list(tenants) == ['a'], (
+                'Неверные настройки не должны применяться'
+            )
+
+    def test_removed_keys_restore_defaults(self, monkeypatch, tmp_path):
+        import homework
+
+        for name in ('RETRY_TIME', 'MAX_STALENESS', 'REQUEST_BUDGET',
+                     'HOMEWORK_STATUSES'):
+            monkeypatch.setattr(homework, name, getattr(homework, name))
+        path = tmp_path / 'tenants.json'
+        scheduler = homework.build_scheduler([])
+        write_config(path, [('a', '1')], retry_time=60,
+                     homework_statuses={'approved': 'Принято!'})
+        homework.apply_config(load_config(str(path)), scheduler, {}, {})
+        assert homework.RETRY_TIME == 60
+        write_config(path, [('a', '1')])
+        homework.apply_config(load_config(str(path)), scheduler, {}, {})
+        assert homework.RETRY_TIME == (
+            homework.DEFAULT_SETTINGS['retry_time']), (
+            'Удалённый из файла ключ должен вернуть значение по умолчанию'
+        )
+        assert homework.HOMEWORK_STATUSES['approved'] == (
+            homework.DEFAULT_SETTINGS['homework_statuses']['approved'])
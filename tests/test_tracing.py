@@ -0,0 +1,61 @@
+import json
+
+import requests
+
+import tracing
+from clock import SimulatedClock
+from fake_api import FakePracticumAPI
+from storage import StateStore
+from tenants import Tenant
+from test_pipeline import RecordingBot
+
+START = 1640995200
+
+
+class TestTracing:
+
+    def test_unsampled_cycles_are_not_traced(self, tmp_path):
+        tracer = tracing.Tracer(sample_rate=0)
+        tracer.export_to(str(tmp_path / 'traces.jsonl'))
+        assert tracer.start('poll_cycle') is tracing.NOOP_TRACE
+
+    def test_poll_cycle_exported_as_otlp(self, monkeypatch, tmp_path):
+        import homework
+
+        path = tmp_path / 'traces.jsonl'
+        tracer = tracing.Tracer(sample_rate=1)
+        tracer.export_to(str(path))
+        clock = SimulatedClock(start=START)
+        api = FakePracticumAPI(clock, [(START - 60, 'hw1', 'reviewing')])
+        tenant = Tenant(name='student', practicum_token='token',
+                        chat_ids=('1', '2'))
+        monkeypatch.setattr(homework, 'CLOCK', clock)
+        monkeypatch.setattr(homework, 'TRACER', tracer)
+        monkeypatch.setattr(requests, 'get', api.get)
+        scheduler = homework.build_scheduler([tenant], clock)
+        pipeline = homework.build_pipeline(RecordingBot(), StateStore(),
+                                           scheduler)
+        clock.on_sleep.append(pipeline.join)
+        pipeline.start()
+        homework.run_polling(pipeline, scheduler, {tenant.name: tenant},
+                             clock, cycles=1)
+        pipeline.stop()
+
+        lines = path.read_text(encoding='utf-8').splitlines()
+        assert len(lines) == 1
+        spans = json.loads(lines[0])['resourceSpans'][0][
+            'scopeSpans'][0]['spans']
+        by_name = {span['name']: span for span in spans}
+        assert set(by_name) == {
+            'poll_cycle', 'check_tokens', 'get_api_answer', 'http_fetch',
+            'json_decode', 'check_response', 'diff', 'parse_status',
+            'send_message'}
+        root_id = by_name['poll_cycle']['spanId']
+        assert by_name['diff']['parentSpanId'] == root_id
+        assert (by_name['http_fetch']['parentSpanId']
+                == by_name['get_api_answer']['spanId']), (
+            'HTTP-запрос должен быть дочерним span’ом get_api_answer'
+        )
+        assert len({span['traceId'] for span in spans}) == 1
+        assert (int(by_name['poll_cycle']['endTimeUnixNano'])
+                >= int(by_name['send_message']['endTimeUnixNano']))
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import metrics
+from pipeline import Pipeline, Stage
+from stall_watchdog import Heartbeat, Watchdog
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestWatchdog:
+
+    def test_stuck_stage_worker_is_replaced(self):
+        release = threading.Event()
+        results = []
+
+        def hang_on_first(number):
+            if number == 0:
+                release.wait()
+            return [number]
+
+        stage = Stage('hang', hang_on_first, deadline=0.05)
+        pipeline = Pipeline([stage, Stage('collect', results.append)])
+        fatal = []
+        watchdog = Watchdog(on_fatal=lambda: fatal.append(True))
+        watchdog.watch(pipeline.heartbeats)
+        stalls = metrics.REGISTRY.counter('watchdog_stalls_pipeline_hang')
+        before = stalls.value
+        pipeline.start()
+        pipeline.submit(0)
+        assert wait_until(lambda: stage.heartbeats()[0].busy_since)
+        time.sleep(0.1)
+        watchdog.check()
+        for number in range(1, 4):
+            pipeline.submit(number)
+        assert wait_until(lambda: len(results) == 3), (
+            'Проверьте, что вместо зависшего потока запущен новый'
+        )
+        assert results == [1, 2, 3]
+        assert stalls.value == before + 1, (
+            'Проверьте, что зависание учитывается в метриках'
+        )
+        assert stage.restarts == 1
+        assert not fatal
+        release.set()
+        pipeline.join()
+        pipeline.stop()
+        assert results == [1, 2, 3, 0], (
+            'Проверьте, что зависший поток дорабатывает свой элемент'
+        )
+
+    def test_fatal_when_restart_impossible(self):
+        fatal = []
+        heartbeat = Heartbeat('poll_loop', deadline=0.01)
+        watchdog = Watchdog(on_fatal=lambda: fatal.append(True))
+        watchdog.watch(lambda: [heartbeat])
+        heartbeat.busy()
+        time.sleep(0.05)
+        watchdog.check()
+        watchdog.check()
+        assert fatal == [True], (
+            'Проверьте, что без restart() сторож перезапускает процесс'
+        )
+
+    def test_idle_worker_is_not_stalled(self):
+        fatal = []
+        heartbeat = Heartbeat('idle', deadline=0.01,
+                              restart=lambda: fatal.append(True))
+        watchdog = Watchdog(on_fatal=lambda: fatal.append(True))
+        watchdog.watch(lambda: [heartbeat])
+        heartbeat.busy()
+        heartbeat.idle()
+        time.sleep(0.05)
+        watchdog.check()
+        assert not fatal, (
+            'Ожидание новой работы не должно считаться зависанием'
+        )
+
+    def test_poll_loop_backpressure_is_not_stalled(self):
+        import homework
+        from clock import SimulatedClock
+        from tenants import Tenant
+
+        # Каждый элемент быстрее срока, но очередь fetch полна дольше
+        fetch = Stage('fetch', lambda cycle: time.sleep(0.03), maxsize=1)
+        pipeline = Pipeline([fetch])
+        tenants = {f't{number}': Tenant(f't{number}', 'token', ('1',))
+                   for number in range(10)}
+        clock = SimulatedClock(on_sleep=[pipeline.join])
+        scheduler = homework.build_scheduler(list(tenants.values()), clock)
+        heartbeat = Heartbeat('poll_loop', deadline=0.1)
+        fatal = []
+        watchdog = Watchdog(interval=0.01,
+                            on_fatal=lambda: fatal.append(True))
+        watchdog.watch(lambda: [heartbeat])
+        watchdog.start()
+        pipeline.start()
+        homework.run_polling(pipeline, scheduler, tenants, clock, cycles=1,
+                             heartbeat=heartbeat)
+        watchdog.stop()
+        pipeline.stop()
+        assert not fatal, (
+            'Ожидание места в очереди fetch не должно считаться зависанием'
+        )
@@ -0,0 +1,230 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Iterator, List, Optional
+
+SERVICE_NAME = 'homework_bot'
+# Коды статуса и вида span'а из спецификации OTLP
+STATUS_OK = 1
+STATUS_ERROR = 2
+KIND_INTERNAL = 1
+KIND_CLIENT = 3
+
+# Активная трасса и span текущего потока
+_local = threading.local()
+
+
+def _attribute(key: str, value: object) -> dict:
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+class Span:
+    """Отрезок работы внутри трассы."""
+
+    def __init__(self, trace_id: str, name: str, parent_id: Optional[str],
+                 kind: int = KIND_INTERNAL, **attributes) -> None:
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes)
+        self.error: Optional[BaseException] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    def set(self, **attributes) -> None:
+        """Добавляет атрибуты span'а."""
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        """Завершает span."""
+        if error is not None:
+            self.error = error
+        self.end_ns = time.time_ns()
+
+    def to_otlp(self) -> dict:
+        """Возвращает span в формате OTLP JSON."""
+        data = {'traceId': self.trace_id,
+                'spanId': self.span_id,
+                'name': self.name,
+                'kind': self.kind,
+                'startTimeUnixNano': str(self.start_ns),
+                'endTimeUnixNano': str(self.end_ns or time.time_ns()),
+                'attributes': [_attribute(key, value) for key, value
+                               in self.attributes.items()],
+                'status': {'code': STATUS_OK}}
+        if self.parent_id:
+            data['parentSpanId'] = self.parent_id
+        if self.error is not None:
+            data['status'] = {'code': STATUS_ERROR,
+                              'message': str(self.error)}
+        return data
+
+
+class NoopSpan:
+    """Span, который ничего не записывает."""
+
+    def set(self, **attributes) -> None:
+        """Игнорирует атрибуты."""
+
+
+class Trace:
+    """Трасса одного цикла опроса.
+
+    Цикл проходит несколько стадий и может породить несколько
+    сообщений, поэтому корневой span закрывается, когда все
+    ветви вызвали done().
+    """
+
+    sampled = True
+
+    def __init__(self, tracer: 'Tracer', name: str, **attributes) -> None:
+        self.tracer = tracer
+        self.trace_id = os.urandom(16).hex()
+        self.root = Span(self.trace_id, name, None, **attributes)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._pending = 1
+
+    @contextmanager
+    def span(self, name: str, kind: int = KIND_INTERNAL,
+             **attributes) -> Iterator[Span]:
+        """Открывает дочерний span текущего span'а потока."""
+        parent = getattr(_local, 'span', None) or self.root
+        span = Span(self.trace_id, name, parent.span_id, kind, **attributes)
+        _local.span = span
+        try:
+            yield span
+        except BaseException as error:
+            span.error = error
+            raise
+        finally:
+            span.end()
+            _local.span = parent if parent is not self.root else None
+            with self._lock:
+                self.spans.append(span)
+
+    def add_span(self, name: str, start_ns: int, end_ns: int,
+                 error: Optional[BaseException] = None,
+                 kind: int = KIND_INTERNAL, **attributes) -> None:
+        """Добавляет уже завершённый span — например, из цикла asyncio."""
+        span = Span(self.trace_id, name, self.root.span_id, kind,
+                    **attributes)
+        span.start_ns, span.end_ns, span.error = start_ns, end_ns, error
+        with self._lock:
+            self.spans.append(span)
+
+    def add_pending(self, count: int) -> None:
+        """Добавляет ветви, которые должны завершиться до экспорта."""
+        with self._lock:
+            self._pending += count
+
+    def done(self, error: Optional[BaseException] = None) -> None:
+        """Завершает одну ветвь; после последней трасса экспортируется."""
+        with self._lock:
+            self._pending -= 1
+            finished = self._pending == 0
+            if error is not None:
+                self.root.error = error
+        if finished:
+            self.root.end()
+            self.tracer.export(self)
+
+    def to_otlp(self) -> dict:
+        """Возвращает трассу в формате OTLP JSON."""
+        spans = [self.root.to_otlp()]
+        spans.extend(span.to_otlp() for span in self.spans)
+        return {'resourceSpans': [{
+            'resource': {'attributes': [
+                _attribute('service.name', SERVICE_NAME)]},
+            'scopeSpans': [{'scope': {'name': SERVICE_NAME},
+                            'spans': spans}],
+        }]}
+
+
+class NoopTrace:
+    """Трасса для циклов, не попавших в выборку."""
+
+    sampled = False
+
+    @contextmanager
+    def span(self, name: str, kind: int = KIND_INTERNAL,
+             **attributes) -> Iterator[NoopSpan]:
+        """Ничего не записывает."""
+        yield NoopSpan()
+
+    def add_span(self, name: str, start_ns: int, end_ns: int,
+                 error: Optional[BaseException] = None,
+                 kind: int = KIND_INTERNAL, **attributes) -> None:
+        """Ничего не делает."""
+
+    def add_pending(self, count: int) -> None:
+        """Ничего не делает."""
+
+    def done(self, error: Optional[BaseException] = None) -> None:
+        """Ничего не делает."""
+
+
+NOOP_TRACE = NoopTrace()
+
+
+@contextmanager
+def activate(trace) -> Iterator[None]:
+    """Делает трассу текущей для span() в этом потоке."""
+    previous = getattr(_local, 'trace', None), getattr(_local, 'span', None)
+    _local.trace, _local.span = trace, None
+    try:
+        yield
+    finally:
+        _local.trace, _local.span = previous
+
+
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """Открывает span в текущей трассе потока, если она есть."""
+    trace = getattr(_local, 'trace', None) or NOOP_TRACE
+    return trace.span(name, kind, **attributes)
+
+
+class Tracer:
+    """Создаёт трассы с заданной частотой и пишет их в файл.
+
+    Каждая трасса — одна строка OTLP JSON; файл ротируется
+    по размеру, как обычный лог.
+    """
+
+    def __init__(self, sample_rate: float = 0.0) -> None:
+        self.sample_rate = sample_rate
+        self._logger = logging.getLogger(f'{__name__}.export')
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+
+    def export_to(self, path: str, max_bytes: int = 5 * 1024 * 1024,
+                  backup_count: int = 3) -> None:
+        """Включает запись трасс в файл с ротацией."""
+        handler = RotatingFileHandler(path, maxBytes=max_bytes,
+                                      backupCount=backup_count,
+                                      encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self._logger.addHandler(handler)
+
+    def start(self, name: str, **attributes):
+        """Начинает трассу, если цикл попал в выборку."""
+        if not self._logger.handlers or random.random() >= self.sample_rate:
+            return NOOP_TRACE
+        return Trace(self, name, **attributes)
+
+    def export(self, trace: Trace) -> None:
+        """Записывает завершённую трассу."""
+        self._logger.info(json.dumps(trace.to_otlp(), ensure_ascii=False))